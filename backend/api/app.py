@@ -4,7 +4,6 @@ import json
 import re
 from secrets import token_hex
 from collections import OrderedDict, defaultdict
-from statistics import stdev, median, mean
 
 import numpy as np
 from typing import List
@@ -14,13 +13,16 @@ from flask_cors import CORS
 from flask_jwt_extended import create_access_token, jwt_required, JWTManager
 
 from sqlalchemy import select, func, and_, or_, distinct
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, selectinload, contains_eager, aliased
 
 from . import auth
 from . import mocks  # todo: remove me
 from . import globals
 from . import race as r
+from . import sql_instrumentation
+from . import descriptive_stats
 from model import model
+from model import world_best_times
 from common.rowing import propulsion_in_meters_per_stroke
 
 
@@ -41,6 +43,9 @@ CORS(app)
 app.config["JWT_SECRET_KEY"] = os.environ.get('JWT_SECRET_KEY') or token_hex(16)
 jwt = JWTManager(app)
 
+# Opt-in SQL statistics per request (Server-Timing header, query budgets), see sql_instrumentation.py
+sql_instrumentation.init_app(app)
+
 # used similar to a context manager. using the constructor creates a scoped session, bound to its creating function scope 
 Scoped_Session = model.Scoped_Session
 
@@ -262,26 +267,17 @@ def get_matrix() -> dict:
         else:
             avg_times_statement = avg_times_statement.where(filter_key_mapping[k].in_(v))
 
-    wbt_statement = (
-        select(
-            model.Boat_Class.additional_id_,
-            model.Race_Boat.result_time_ms
-        )
-        .join(model.Race_Boat)
-    )
-
     avg_times = session.execute(avg_times_statement).fetchall()
-    wbts = session.execute(wbt_statement).fetchall()
 
     result = {}
 
     for time in avg_times:
-        wbt = [wbt for wbt in wbts if wbt[0] == time.id]
-        if len(wbt) < 1:
+        wbt = world_best_times.get_by_uuid(session, time.id)
+        if wbt == None or wbt.race_boat_id == None:
             wbt = time.min
             used_wbt = True
         else:
-            wbt = wbt[0][1]
+            wbt = wbt.result_time_ms
             used_wbt = False
 
         result[time.id] = {
@@ -416,23 +412,10 @@ def get_competition_matrix() -> dict:
     keys = result.keys()
     data_as_dict = [dict(zip(keys, row)) for row in result]
 
-    # Separate table for wbt
-    wbt_statement = (
-        select(
-            model.Race_Boat.result_time_ms.label("Bestzeit"),
-            model.Boat_Class.abbreviation.label("Bootsklasse"),
-            model.Race.date.label("Wbt_date")
-        )
-            .outerjoin(model.Boat_Class.world_best_race_boat)
-            .outerjoin(model.Race_Boat.race)
-        ) 
-
-    wbt_result = session.execute(wbt_statement).fetchall()
-
     # Map: Bootsklasse → (Bestzeit, Datum)
     wbt_lookup = {
-        row.Bootsklasse: (row.Bestzeit, row.Wbt_date)
-        for row in wbt_result if row.Bootsklasse
+        abbreviation: (wbt.result_time_ms, wbt.date)
+        for abbreviation, wbt in world_best_times.get_all(session).items() if abbreviation
     }
 
     for row in data_as_dict:
@@ -442,8 +425,9 @@ def get_competition_matrix() -> dict:
         zeiten = qualified_by_class.get(boatclass)
 
         if zeiten:
-            qual_avg = round(mean(zeiten), 1)
-            qual_std = round(stdev(zeiten), 1) if len(zeiten) > 1 else 0
+            zeiten = descriptive_stats.as_array(zeiten)
+            qual_avg = round(descriptive_stats.mean(zeiten), 1)
+            qual_std = round(descriptive_stats.stdev(zeiten), 1) if len(zeiten) > 1 else 0
         else:
             qual_avg = None
             qual_std = None
@@ -480,12 +464,30 @@ def get_race_boat_groups():
     """
     WHEN? THIS FUNCTION IS CALLED WHEN THE USER SELECTED RACEGROUPS WITH THE MULTIPLE FILTER IN RENNSTRUKTURANALYSE
     Gets the mandatory information to display a race-analysis of several race-boat-groups (Rennstrukturanalyse-Multiple).
+
+    Optional request data to keep the response small for large groups (the summaries always cover all boats):
+    - include_race_boats (default true): false omits the per-boat detail ("race_boats") of the groups
+    - race_boats_limit: max. race boats per group and response, ordered by id. Further pages are requested with
+      "race_boats_cursor" of the group filter set to "race_boats_next_cursor" of the previous response (null: last page)
+    - race_data_resolution: only GPS points (race_data, stats_race_data) at multiples of this distance in meters
     @return: the information of the race groups
     """
     session = Scoped_Session()
 
     boat_class = request.json["data"]["boat_class"]
     groups_filter = request.json["data"]["groups"]
+    include_race_boats = request.json["data"].get("include_race_boats", True)
+    race_boats_limit = request.json["data"].get("race_boats_limit")
+    race_data_resolution = request.json["data"].get("race_data_resolution")
+
+    def is_positive_int(value) -> bool:
+        # JSON true/false arrive as bool, a subclass of int
+        return isinstance(value, int) and not isinstance(value, bool) and value >= 1
+
+    if (not isinstance(include_race_boats, bool)
+        or race_boats_limit is not None and not is_positive_int(race_boats_limit)
+        or race_data_resolution is not None and not is_positive_int(race_data_resolution)):
+        abort(400)
 
     groups = []
     for index, data in enumerate(groups_filter):
@@ -498,9 +500,19 @@ def get_race_boat_groups():
         phases_filter = data["phases"]
         phases, phases_subtype = r.separatePhaseTypes(phases_filter)
         athletes_id = data.get("athletes")
-
+        cursor = data.get("race_boats_cursor")
+        if cursor is not None:
+            # race boat id as returned in "race_boats_next_cursor" (str) or as a number
+            if isinstance(cursor, bool) or not isinstance(cursor, (int, str)):
+                abort(400)
+            try:
+                cursor = int(cursor)
+            except ValueError:
+                abort(400)
+
+        # ids of all boats of the group (with their competition type) for the summaries
         statement = (
-        select(model.Race_Boat)
+        select(model.Race_Boat.id, model.Competition_Type.abbreviation)
         .distinct()
         .join(model.Race_Boat.country)
         .join(model.Race_Boat.race)
@@ -526,24 +538,62 @@ def get_race_boat_groups():
                     model.Race.phase_number.in_(phases_subtype)
                 )
             )
-        ))
+        )
+        .order_by(model.Race_Boat.id))
 
         if athletes_id:
             statement = statement.where(
                 model.Association_Race_Boat_Athlete.athlete_id == athletes_id,
             )
-    
-        race_boats: List[model.Race_Boat]
-        race_boats = session.execute(statement).scalars().all()
+
+        rows = session.execute(statement).all()
+        race_boat_ids = [race_boat_id for race_boat_id, _ in rows]
+        relevant_competitions = dict.fromkeys(abbreviation for _, abbreviation in rows)
+        total_boats = len(race_boat_ids)
+
+        # the page of race boats with per-boat detail
+        page_ids = []
+        next_cursor = None
+        if include_race_boats:
+            page_ids = race_boat_ids
+            if cursor is not None:
+                page_ids = [race_boat_id for race_boat_id in race_boat_ids if race_boat_id > cursor]
+            if race_boats_limit is not None and len(page_ids) > race_boats_limit:
+                page_ids = page_ids[:race_boats_limit]
+                next_cursor = str(page_ids[-1])
+
+        race_boats: List[model.Race_Boat] = []
+        if page_ids:
+            # Load every relationship used below up front: the joined many-to-one path is
+            # populated from the joins, collections are fetched with one SELECT ... IN each.
+            # This keeps the number of queries per group constant, independent of the number of boats.
+            statement = (
+                select(model.Race_Boat)
+                .join(model.Race_Boat.race)
+                .join(model.Race.event)
+                .join(model.Event.competition)
+                .join(model.Competition.competition_type)
+                .where(model.Race_Boat.id.in_(page_ids))
+                .order_by(model.Race_Boat.id)
+                .options(
+                    contains_eager(model.Race_Boat.race)
+                    .contains_eager(model.Race.event)
+                    .contains_eager(model.Event.competition)
+                    .options(
+                        contains_eager(model.Competition.competition_type),
+                        joinedload(model.Competition.venue)
+                    ),
+                    selectinload(model.Race_Boat.intermediates),
+                    selectinload(model.Race_Boat.race_data),
+                    selectinload(model.Race_Boat.athletes)
+                    .joinedload(model.Association_Race_Boat_Athlete.athlete)
+                )
+            )
+            race_boats = session.execute(statement).scalars().all()
 
         boats_formatted = []
-        relevant_competitions = set()
-        total_boats = 0
 
         for boat in race_boats:
-            total_boats+= 1
-            relevant_competitions.add(boat.race.event.competition.competition_type.abbreviation)
-
             # intermediate data
             times = r.getIntermediateTimes(boat)
             calculated_times = r.calculateIntermediateTimes(times)
@@ -557,6 +607,8 @@ def get_race_boat_groups():
             sorted_race_data = sorted(boat.race_data, key=lambda x: x.distance_meter)
             race_data: model.Race_Data
             for race_data in sorted_race_data:
+                if race_data_resolution and race_data.distance_meter % race_data_resolution != 0:
+                    continue
                 propulsion = propulsion_in_meters_per_stroke(race_data.stroke, race_data.speed_meter_per_sec)
                 race_data_result[str(race_data.distance_meter)] = {
                     "speed [m/s]": race_data.speed_meter_per_sec,
@@ -584,51 +636,8 @@ def get_race_boat_groups():
 
             boats_formatted.append(boat_formatted)
 
-        #Get intermediate values of all boats
-        stats = {}
-        for boat in boats_formatted:
-            for distance, values in boat["intermediates"].items():
-                if distance not in stats:
-                    stats[distance] = {}
-                for key, figure in values.items():
-                    if key not in stats[distance]:
-                        stats[distance][key] = []
-                    stats[distance][key].append(figure)
-
-        #Calculate means 
-        summary = {}
-        for distance, values in stats.items():
-            summary[distance] = {}
-            for key, figures in values.items():
-                if key != "is_outlier":
-                    summary[distance][key] = {}
-                    mean, lower, upper =  r.calculateConfidenceIntervall(figures)
-                    summary[distance][key]["mean"] = mean
-                    summary[distance][key]["lower_bound"] = lower
-                    summary[distance][key]["upper_bound"] = upper
-
-        #Get race_data/gps values of all boats 
-        stats_gps = {}
-        for boat in boats_formatted:
-            for distance, values in boat["race_data"].items():
-                if distance not in stats_gps:
-                    stats_gps[distance] = {}
-                for key, figure in values.items():
-                    if key not in stats_gps[distance]:
-                        stats_gps[distance][key] = []
-                    stats_gps[distance][key].append(figure)
-
-        #Calculate means for gps data
-        summary_gps = {}
-        for distance, values in stats_gps.items():
-            summary_gps[distance] = {}
-            for key, figures in values.items():
-                if key != "is_outlier":
-                    summary_gps[distance][key] = {}
-                    mean, lower, upper =  r.calculateConfidenceIntervall(figures)
-                    summary_gps[distance][key]["mean"] = mean
-                    summary_gps[distance][key]["lower_bound"] = lower
-                    summary_gps[distance][key]["upper_bound"] = upper
+        # means & confidence intervals per distance and metric of all boats of the group (independent of the page)
+        summary, summary_gps = r.raceBoatGroupSummary(session, race_boat_ids, race_data_resolution)
 
         #Get Pacing Profile
         pacing_profile = "-"
@@ -636,7 +645,12 @@ def get_race_boat_groups():
             pacing_profile =  r.getPacingProfile(summary[500]["pace [millis]"]["mean"], summary[1000]["pace [millis]"]["mean"], summary[1500]["pace [millis]"]["mean"], summary[2000]["pace [millis]"]["mean"])
 
         group = f"Gruppe {index + 1}"
-        groups.append({"name": group, "stats": summary, "stats_race_data": summary_gps, "pacing_profile": pacing_profile, "count": total_boats, "min_year": min_Year, "max_year": max_Year,"events": list(relevant_competitions), "phases": phases_filter, "ranks": ranks, "country": country, "race_boats": boats_formatted})
+        group_result = {"name": group, "stats": summary, "stats_race_data": summary_gps, "pacing_profile": pacing_profile, "count": total_boats, "min_year": min_Year, "max_year": max_Year,"events": list(relevant_competitions), "phases": phases_filter, "ranks": ranks, "country": country}
+        if include_race_boats:
+            group_result["race_boats"] = boats_formatted
+            if race_boats_limit is not None:
+                group_result["race_boats_next_cursor"] = next_cursor
+        groups.append(group_result)
 
     #World Best Times
     best_oz_time = r.getOzBestTime(boat_class, datetime.datetime.today().year)
@@ -660,12 +674,19 @@ def get_race(race_id: int) -> dict:
     # Join relationship fields using "Joined Load" to fetch all-in-one:
     #   https://docs.sqlalchemy.org/en/14/orm/tutorial.html#joined-load
     #   https://docs.sqlalchemy.org/en/14/orm/loading_relationships.html#sqlalchemy.orm.joinedload
+    # Collections of the race boats are fetched with "Select IN" loading to avoid a cartesian product:
+    #   https://docs.sqlalchemy.org/en/14/orm/loading_relationships.html#select-in-loading
     statement = (
         select(model.Race)
         .where(model.Race.id == int(race_id))
         .options(
             joinedload(model.Race.race_boats)
-            .joinedload(model.Race_Boat.intermediates),
+            .options(
+                joinedload(model.Race_Boat.intermediates),
+                selectinload(model.Race_Boat.race_data),
+                selectinload(model.Race_Boat.athletes)
+                .joinedload(model.Association_Race_Boat_Athlete.athlete)
+            ),
             joinedload(model.Race.event)
             .options(
                 joinedload(model.Event.boat_class),
@@ -710,6 +731,9 @@ def get_race(race_id: int) -> dict:
         "race_boats": []
     }
 
+    # the figure matrix covers all boats of the race, so compute it only once
+    intermediates_figures = r.compute_intermediates_figures(race.race_boats)
+
     sorted_race_boat_data = sorted(race.race_boats, key=lambda x: x.rank if x.rank is not None else float('inf'))
     race_boat: model.Race_Boat
     for race_boat in sorted_race_boat_data:
@@ -739,7 +763,6 @@ def get_race(race_id: int) -> dict:
             }
 
         # intermediates
-        intermediates_figures =  r.compute_intermediates_figures(race.race_boats)
         strokes_for_intermediates =  r.strokes_for_intermediate_steps(race_boat.race_data)
         total_time = race_boat.result_time_ms
         for distance_meter, figures in intermediates_figures[race_boat.id].items(): # ❌ TODO: iterate over figure matrix (see intermediates_figures) to provide dicts for all 'cells'
@@ -794,106 +817,94 @@ def get_report_boat_class():
 
     session = Scoped_Session()
 
-    statement = (
-        select(
-            model.Race.id.label("race_id")
-        )
+    # the filters of the report: races ...
+    races_statement = (
+        select(model.Race.id)
         .join(model.Race.event)
+        .join(model.Event.boat_class)
         .join(model.Event.competition)
         .join(model.Competition.competition_type)
         .join(model.Competition_Type.competition_category)
-        .where(and_(
+        .where(
             model.Race.date >= start_date,
             model.Race.date <= end_date,
-            model.Event.boat_class_id == model.Boat_Class.id,
             model.Boat_Class.abbreviation == boat_class,
             model.Competition_Type.additional_id_.in_(competition_types)
-        ))
+        )
+    )
+    # ... and their race boats with a result
+    race_boat_conditions = [
+        model.Race_Boat.result_time_ms != 0,
+        model.Race.phase_type.in_(runs or [])
+    ]
+    if ranks:
+        race_boat_conditions.append(model.Race_Boat.rank.in_(ranks))
+
+    # one row per race (without qualified race boats) or per qualified race boat
+    race_boats_statement = (
+        races_statement
+        .with_only_columns(model.Competition_Category.name, model.Race.date, model.Race_Boat.result_time_ms)
+        .outerjoin(model.Race_Boat, and_(model.Race_Boat.race_id == model.Race.id, *race_boat_conditions))
+        .order_by(model.Race.id, model.Race_Boat.id)
     )
+    rows = session.execute(race_boats_statement).all()
+
+    intermediates_statement = (
+        races_statement
+        .with_only_columns(model.Intermediate_Time.distance_meter, model.Intermediate_Time.result_time_ms)
+        .join(model.Race.race_boats)
+        .join(model.Race_Boat.intermediates)
+        .where(
+            *race_boat_conditions,
+            model.Intermediate_Time.distance_meter.in_([500, 1000]),
+            model.Intermediate_Time.result_time_ms != None,
+            model.Intermediate_Time.is_outlier == False
+        )
+    )
+    intermediates = session.execute(intermediates_statement).all()
 
-    result = session.execute(statement).fetchall()
     boat_class_name, wb_time, lowest_time_period = "", 0, 0
-    race_times, race_dates, int_times_500, int_times_1000 = [], [], [], []
-    comp_categories = set()
-
-    for row in result:
-        race_id = row
-        race = session.query(model.Race).get(race_id)
-        boat_class_name = race.event.boat_class.abbreviation
-        comp_categories.add(race.event.competition.competition_type.competition_category.name)
-
-        world_best_race_boat = race.event.boat_class.world_best_race_boat
-        if world_best_race_boat:
-            wb_time = world_best_race_boat.result_time_ms
-
-        for race_boat in race.race_boats:
-            if race_boat.result_time_ms and race.date and race.phase_type in runs \
-                    and (race_boat.rank in ranks if ranks else True):
-                race_times.append(race_boat.result_time_ms)
-                date = race.date
-                race_dates.append(
-                    '{:02d}'.format(date.year) + '-{:02d}'.format(date.month) + '-{:02d}'.format(date.day))
-                intermediate_times_for_race_boat = session.query(model.Intermediate_Time).filter(
-                    model.Intermediate_Time.race_boat_id == race_boat.id, 
-                    model.Intermediate_Time.is_outlier == False
-                ).all()
-                for intermediate_time in intermediate_times_for_race_boat:
-                    if intermediate_time.distance_meter == 500:
-                        int_times_500.append(intermediate_time.result_time_ms)
-                    elif intermediate_time.distance_meter == 1000:
-                        int_times_1000.append(intermediate_time.result_time_ms)
-
-    avg_500_time = int(mean(int_times_500)) if int_times_500 else 0
-    avg_1000_time = int(mean(int_times_1000)) if int_times_1000 else 0
+    comp_categories = {category for category, _, _ in rows}
+    if rows:
+        boat_class_name = boat_class
+        wb_time = world_best_times.result_time_ms(session, boat_class_name, default=0)
+
+    race_boat_rows = [(date, result_time_ms) for _, date, result_time_ms in rows if result_time_ms != None]
+    race_times = descriptive_stats.as_array([result_time_ms for _, result_time_ms in race_boat_rows])
+    race_dates = [f'{date.year:02d}-{date.month:02d}-{date.day:02d}' for date, _ in race_boat_rows]
+
+    intermediate_times = np.array(intermediates, dtype=np.int32).reshape(-1, 2)
+    avg_500_time = descriptive_stats.int_mean(intermediate_times[intermediate_times[:, 0] == 500, 1])
+    avg_1000_time = descriptive_stats.int_mean(intermediate_times[intermediate_times[:, 0] == 1000, 1])
 
     results, mean_speed, mean_time, stdev_race_time, median_race_time = 0, 0, 0, 0, 0
     hist_data, hist_labels = [], []
-    fastest_times_mean, fastest_times_n = 0, 0
-    medium_times_mean, medium_times_n = 0, 0
-    slow_times_mean, slow_times_n = 0, 0
-    slowest_times_mean, slowest_times_n = 0, 0
+    gradations = [descriptive_stats.Gradation(0, 0)] * len(descriptive_stats.GRADATIONS)
     sd_1_low, sd_1_high = 0, 0
     hist_mean, hist_sd_low, hist_sd_high = 0, 0, 0
 
-    if race_times:
-        results = len(race_times)
-        lowest_time_period = min(race_times)
+    if len(race_times):
+        summary = descriptive_stats.describe(race_times)
+        results = summary.n
+        lowest_time_period = summary.min
         # TODO: Set race length dynamically
         race_distance = 2000
-        mean_speed = round(mean([race_distance / (time / 1000) for time in race_times]), 2)
-        mean_time = int(mean(race_times))
-        stdev_race_time = int(stdev(race_times))
-        median_race_time = int(median(race_times))
-
-        hist_data, bin_edges = np.histogram(race_times, bins="fd")
-        hist_data = hist_data.tolist() if len(hist_data) > 0 else []
-        hist_labels = [int(bin_edge) for bin_edge in bin_edges]
-        hist_mean = np.average(bin_edges[:-1], weights=hist_data)
-        hist_var = np.average((bin_edges[:-1] - hist_mean) ** 2, weights=hist_data)
-        hist_std = np.sqrt(hist_var)
-        hist_sd_low = hist_mean - hist_std
-        hist_sd_high = hist_mean + hist_std
-
-        fastest_times = [x for x in race_times if x < (mean_time - stdev_race_time)]
-        medium_times = [x for x in race_times if
-                        (mean_time - stdev_race_time) < x < (mean_time - (1 / 3 * stdev_race_time))]
-        slow_times = [x for x in race_times if
-                      (mean_time - (1 / 3 * stdev_race_time)) < x < (mean_time + (1 / 3 * stdev_race_time))]
-        slowest_times = [x for x in race_times if x > (mean_time + (1 / 3 * stdev_race_time))]
-
-        fastest_times_n = len(fastest_times)
-        medium_times_n = len(medium_times)
-        slow_times_n = len(slow_times)
-        slowest_times_n = len(slowest_times)
-
-        fastest_times_mean = int(mean(fastest_times))
-        medium_times_mean = int(mean(medium_times))
-        slow_times_mean = int(mean(slow_times))
-        slowest_times_mean = int(mean(slowest_times))
+        mean_speed = round(float(np.mean(race_distance / (race_times / 1000))), 2)
+        mean_time = summary.mean
+        stdev_race_time = summary.stdev
+        median_race_time = summary.median
+
+        histogram = descriptive_stats.histogram_fd(race_times)
+        hist_data, hist_labels = histogram.data, histogram.labels
+        hist_mean, hist_sd_low, hist_sd_high = histogram.mean, histogram.sd_low, histogram.sd_high
+
+        gradations = descriptive_stats.gradations(race_times, mean_time, stdev_race_time)
 
         sd_1_low = mean_time - stdev_race_time
         sd_1_high = mean_time + stdev_race_time
 
+    fastest, medium, slow, slowest = gradations
+
     return json.dumps({
         "competition_categories": list(comp_categories),
         "results": results,
@@ -911,20 +922,20 @@ def get_report_boat_class():
         "std_dev": stdev_race_time,
         "median": median_race_time,
         "gradation_fastest": {
-            "results": fastest_times_n,
-            "time": fastest_times_mean
+            "results": fastest.results,
+            "time": fastest.time
         },
         "gradation_medium": {
-            "results": medium_times_n,
-            "time": medium_times_mean
+            "results": medium.results,
+            "time": medium.time
         },
         "gradation_slow": {
-            "results": slow_times_n,
-            "time": slow_times_mean
+            "results": slow.results,
+            "time": slow.time
         },
         "gradation_slowest": {
-            "results": slowest_times_n,
-            "time": slowest_times_mean
+            "results": slowest.results,
+            "time": slowest.time
         },
         "plot_data": {
             "histogram": {
@@ -936,7 +947,7 @@ def get_report_boat_class():
             "histogram_sd_high": int(hist_sd_high),
             "scatter_plot": {
                 "labels": race_dates,
-                "data": race_times
+                "data": race_times.tolist()
             },
             "scatter_1_sd_low": {
                 "labels": [
@@ -967,56 +978,70 @@ def get_athlete(athlete_id: int):
     Gives athlete data and race list for specific athlete.
     """
     session = Scoped_Session()
-    athlete = session.query(model.Athlete).filter_by(id=int(athlete_id)).first()
-    athlete_race_boats = [race_boat.race_boat_id for race_boat in athlete.race_boats]
-
-    race_boats = session.query(model.Race_Boat).filter(model.Race_Boat.id.in_(athlete_race_boats)).all()
-
-    race_results, race_ids, athlete_boat_classes, best_time_boat_class, nation, race_phase = [], [], set(), "", "", ""
-    total, gold, silver, bronze, final_a, final_b = 0, 0, 0, 0, 0, 0
-
-    for i, race_boat in enumerate(race_boats):
-        race_ids.append(race_boat.race_id)
-        boat = race_boat.race
-        phase = boat.phase_type
-        phase_num = boat.phase_number
-
-        race_phase = r.getPhaseType(phase, boat.phase_subtype, phase_num)
+    athlete = session.get(model.Athlete, athlete_id)
+    if athlete == None:
+        abort(404)
 
-        if phase == 'final' and phase_num == 1:
-            final_a += 1
-            if race_boat.rank == 1:
-                gold += 1
-                total += 1
-            elif race_boat.rank == 2:
-                silver += 1
-                total += 1
-            elif race_boat.rank == 3:
-                bronze += 1
-                total += 1
-        elif phase == 'final' and phase_num == 2:
-            final_b += 1
+    # One row per race of the athlete (newest first) with everything the race list needs; the medal and final
+    # counters are window aggregates over all rows, i.e. the same in every row.
+    is_final_a = and_(model.Race.phase_type == 'final', model.Race.phase_number == 1)
+    is_final_b = and_(model.Race.phase_type == 'final', model.Race.phase_number == 2)
+    venue_country = aliased(model.Country)
+    statement = (
+        select(
+            model.Race_Boat.race_id,
+            model.Race_Boat.rank,
+            model.Race_Boat.result_time_ms,
+            model.Race.phase_type,
+            model.Race.phase_subtype,
+            model.Race.phase_number,
+            model.Race.date,
+            model.Competition.name.label("competition"),
+            model.Venue.city,
+            venue_country.name.label("venue_country"),
+            model.Boat_Class.abbreviation.label("boat_class"),
+            model.Competition_Category.name.label("competition_category"),
+            model.Gender.name.label("gender"),
+            model.Country.country_code,
+            func.count().filter(and_(is_final_a, model.Race_Boat.rank == 1)).over().label("gold"),
+            func.count().filter(and_(is_final_a, model.Race_Boat.rank == 2)).over().label("silver"),
+            func.count().filter(and_(is_final_a, model.Race_Boat.rank == 3)).over().label("bronze"),
+            func.count().filter(is_final_a).over().label("final_a"),
+            func.count().filter(is_final_b).over().label("final_b")
+        )
+        .select_from(model.Association_Race_Boat_Athlete)
+        .join(model.Association_Race_Boat_Athlete.race_boat)
+        .join(model.Race_Boat.race)
+        .join(model.Race.event)
+        .join(model.Event.competition)
+        .join(model.Event.boat_class)
+        .outerjoin(model.Event.gender)
+        .outerjoin(model.Race_Boat.country)
+        .outerjoin(model.Competition.venue)
+        .outerjoin(venue_country, model.Venue.country)
+        .outerjoin(model.Competition.competition_type)
+        .outerjoin(model.Competition_Type.competition_category)
+        .where(model.Association_Race_Boat_Athlete.athlete_id == athlete_id)
+        .order_by(model.Race.date.desc(), model.Race.id)
+    )
+    rows = session.execute(statement).all()
 
+    race_results, athlete_boat_classes, gender, athlete_disciplines = [], set(), set(), set()
+    for row in rows:
         race_results.append({
-            "race_id": race_boat.race_id,
-            "rank": race_boat.rank,
-            "race_phase": race_phase,
-            "result_time": race_boat.result_time_ms,
-            "name": race_boat.race.event.competition.name,
-            "venue": f'{race_boat.race.event.competition.venue.city}, {race_boat.race.event.competition.venue.country.name}',
-            "boat_class": race_boat.race.event.boat_class.abbreviation,
-            "start_time": str((race_boat.race.date).strftime("%Y-%m-%d %H:%M")),
-            "competition_category": race_boat.race.event.competition.competition_type.competition_category.name
+            "race_id": row.race_id,
+            "rank": row.rank,
+            "race_phase": r.getPhaseType(row.phase_type, row.phase_subtype, row.phase_number),
+            "result_time": row.result_time_ms,
+            "name": row.competition,
+            "venue": f'{row.city}, {row.venue_country}',
+            "boat_class": row.boat_class,
+            "start_time": str((row.date).strftime("%Y-%m-%d %H:%M")),
+            "competition_category": row.competition_category
         })
-        nation = race_boat.country.country_code
-
-    races = session.query(model.Race).order_by(model.Race.date.desc()).filter(model.Race.id.in_(race_ids)).all()
 
-    gender, athlete_disciplines = set(), set()
-    for i, race in enumerate(races):
-        gender.add(race.event.gender.name)
-        boat_class_name = race.event.boat_class.abbreviation
-        athlete_boat_classes.add(boat_class_name)
+        gender.add(row.gender)
+        athlete_boat_classes.add(row.boat_class)
 
         # check disciplines
         if any(ath.endswith("x") for ath in athlete_boat_classes):
@@ -1024,13 +1049,19 @@ def get_athlete(athlete_id: int):
         elif not any(ath.endswith("x") for ath in athlete_boat_classes):
             athlete_disciplines.add("Riemen")
 
+    first = rows[0] if rows else None
+    nation = first.country_code if first else ""
+    gold, silver, bronze = (first.gold, first.silver, first.bronze) if first else (0, 0, 0)
+    final_a, final_b = (first.final_a, first.final_b) if first else (0, 0)
+    total = gold + silver + bronze
+
     sorted_race_results = sorted(race_results, key=lambda item: item['start_time'], reverse=True)
 
     return json.dumps({
         "name": athlete.name,
         "athlete_id": athlete.id,
         "nation": nation,
-        "gender": gender.pop(),
+        "gender": gender.pop() if gender else None,
         "dob": str(athlete.birthdate),
         "weight": athlete.weight_kg__,
         "height": athlete.height_cm__,
@@ -1042,7 +1073,7 @@ def get_athlete(athlete_id: int):
         "medals_bronze": bronze,
         "final_a": final_a,
         "final_b": final_b,
-        "num_of_races": len(athlete_race_boats),
+        "num_of_races": len(rows),
         "race_list": sorted_race_results,
     })
 
@@ -0,0 +1,96 @@
+"""
+Descriptive statistics of result times (ms) for the report endpoints, on contiguous NumPy arrays.
+
+The results are identical to the former implementation with the statistics module: means of integers are computed
+exactly (int(statistics.mean(x)) == int_mean(x), statistics.mean(x) == mean(x)). The standard deviation is computed
+in float64 and may differ from statistics.stdev() in the last bits, which the reports drop by truncating or rounding
+it. See tests/test_descriptive_stats.py.
+"""
+from statistics import StatisticsError
+from collections import namedtuple
+
+import numpy as np
+
+
+Summary = namedtuple("Summary", ["n", "min", "max", "mean", "stdev", "median"])
+Histogram = namedtuple("Histogram", ["data", "labels", "mean", "sd_low", "sd_high"])
+Gradation = namedtuple("Gradation", ["results", "time"])
+
+# order of the buckets returned by gradations()
+GRADATIONS = ("fastest", "medium", "slow", "slowest")
+
+
+_INT32 = np.iinfo(np.int32)
+
+
+def as_array(values) -> np.ndarray:
+    """Contiguous int32 array of result times (ms); None is not allowed (TypeError), values out of the int32 range
+    raise OverflowError instead of wrapping around"""
+    values = np.ascontiguousarray(values, dtype=np.int64)
+    if len(values) and (values.min() < _INT32.min or values.max() > _INT32.max):
+        raise OverflowError("Result time out of int32 range")
+    return values.astype(np.int32)
+
+
+def _sum(values: np.ndarray) -> int:
+    return int(values.sum(dtype=np.int64))
+
+
+def mean(values: np.ndarray):
+    """Mean like statistics.mean() of ints: int if exact, otherwise float (exact sum, one rounding)"""
+    total, n = _sum(values), len(values)
+    if n < 1:
+        raise StatisticsError("mean requires at least one data point")
+    return total // n if total % n == 0 else total / n
+
+
+def int_mean(values: np.ndarray) -> int:
+    """int(statistics.mean(values)) of non-negative ints, 0 if empty"""
+    return _sum(values) // len(values) if len(values) else 0
+
+
+def stdev(values: np.ndarray) -> float:
+    """Sample standard deviation like statistics.stdev() (0 if less than two values)"""
+    return float(np.std(values, ddof=1, dtype=np.float64)) if len(values) > 1 else 0.
+
+
+def describe(values: np.ndarray) -> Summary:
+    """Summary of a non-empty array; mean, stdev and median are truncated to ints like in the reports"""
+    return Summary(
+        n=len(values),
+        min=int(values.min()),
+        max=int(values.max()),
+        mean=int_mean(values),
+        stdev=int(stdev(values)),
+        median=int(np.median(values))
+    )
+
+
+def histogram_fd(values: np.ndarray) -> Histogram:
+    """Histogram with Freedman-Diaconis bins, its weighted mean and mean -/+ standard deviation"""
+    counts, bin_edges = np.histogram(values, bins="fd")
+    hist_mean = np.average(bin_edges[:-1], weights=counts)
+    hist_std = np.sqrt(np.average((bin_edges[:-1] - hist_mean) ** 2, weights=counts))
+    return Histogram(
+        data=counts.tolist(),
+        labels=[int(bin_edge) for bin_edge in bin_edges],
+        mean=hist_mean,
+        sd_low=hist_mean - hist_std,
+        sd_high=hist_mean + hist_std
+    )
+
+
+def gradations(values: np.ndarray, mean_: int, stdev_: int) -> list:
+    """Buckets (see GRADATIONS) split at mean - stdev, mean - stdev/3 and mean + stdev/3. Values equal to a bound
+    belong to no bucket. Returns a list of Gradation(results, int mean of the bucket or 0)."""
+    bounds = np.array([mean_ - stdev_, mean_ - (1 / 3 * stdev_), mean_ + (1 / 3 * stdev_)])
+    values = values[~np.isin(values, bounds)]
+    buckets = np.digitize(values, bounds)
+
+    counts = np.bincount(buckets, minlength=len(GRADATIONS))
+    # float sums of int32 values are exact below 2**53
+    sums = np.bincount(buckets, weights=values, minlength=len(GRADATIONS))
+    return [
+        Gradation(results=int(count), time=int(total // count) if count else 0)
+        for count, total in zip(counts, sums)
+    ]
@@ -1,4 +1,5 @@
 import os
+import csv
 import datetime
 import itertools
 import math
@@ -6,17 +7,24 @@ import statistics
 from collections import OrderedDict, defaultdict
 from collections.abc import Iterable
 from contextlib import suppress
+from functools import lru_cache
+from types import MappingProxyType
 import re
 
 from scipy import stats
 import numpy as np
-import pandas as pd
 from sqlalchemy import select, or_, and_, func
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 
 from model import model
+from model import world_best_times
 from common.helpers import stepfunction
 from . import globals
 
+import logging
+logger = logging.getLogger(__name__)
+
+WBT_CSV_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'wbt.csv'))
 
 COND_VALID_2000M_RESULTS = and_(
     model.Intermediate_Time.distance_meter == 2000,
@@ -287,12 +295,7 @@ def calculateConfidenceIntervall(sample_data: list) -> tuple:
         std_dev = np.std(sample_data, ddof=1)  # ddof=1 for sample standard deviation
         std_error = std_dev / math.sqrt(n)
         
-        if n<= 30: 
-            critical_value = stats.t.ppf(1 - 0.05/2, n - 1) #t-value for 95% confidence
-        else:
-            critical_value = 1.96  #z-value for large sample sizes
-
-        margin_of_error = critical_value * std_error
+        margin_of_error = criticalValue(n) * std_error
 
         #Calculate confidence Intervall
         lower = mean - margin_of_error
@@ -300,6 +303,161 @@ def calculateConfidenceIntervall(sample_data: list) -> tuple:
 
         return mean, lower, upper
 
+@lru_cache(maxsize=None)
+def criticalValue(n: int) -> float:
+    """Critical value of the 95% confidence interval for a sample of size n (cached, stats.t.ppf is slow)"""
+    if n <= 30:
+        return stats.t.ppf(1 - 0.05/2, n - 1) #t-value for 95% confidence
+    return 1.96 #z-value for large sample sizes
+
+def _confidenceIntervalDict(values: np.ndarray) -> dict:
+    """calculateConfidenceIntervall() of an array (NaN instead of None) as dict"""
+    values = values[values > 0] # contiguous copy, i.e. np.mean/np.std sum up like for a list
+    n = len(values)
+    if n == 0:
+        mean, lower, upper = 0, 0, 0
+    elif n == 1:
+        mean = lower = upper = values[0].item()
+    else:
+        mean = np.mean(values)
+        std_error = np.std(values, ddof=1) / math.sqrt(n)
+        margin_of_error = criticalValue(n) * std_error
+        lower, upper = mean - margin_of_error, mean + margin_of_error
+    return {"mean": mean, "lower_bound": lower, "upper_bound": upper}
+
+def _columnsPerRaceBoat(session, race_boat_ids: list, table, columns: tuple, *criteria) -> tuple:
+    """
+    Fetches columns of a table with (race_boat_id, distance_meter) as primary key as one array per column: rows
+    sorted by the position of their boat in race_boat_ids and by distance. The rows are aggregated to arrays per
+    boat in the database, i.e. the result has one row per boat (no ORM/Row objects per data point).
+
+    Returns:
+        Tuple: boat position (int64 array) followed by a float64 array per column (None -> nan)
+    """
+    position = {race_boat_id: i for i, race_boat_id in enumerate(race_boat_ids)}
+    rows = session.execute(
+        select(table.race_boat_id,
+               *(func.array_agg(aggregate_order_by(column, table.distance_meter)) for column in columns))
+        .where(table.race_boat_id.in_(race_boat_ids), *criteria)
+        .group_by(table.race_boat_id)
+    ).all()
+    rows.sort(key=lambda row: position[row[0]])
+    boats = np.repeat([position[row[0]] for row in rows], [len(row[1]) for row in rows]).astype(np.int64)
+    arrays = tuple(
+        np.array(list(itertools.chain.from_iterable(row[i] for row in rows)), dtype=np.float64)
+        for i in range(1, len(columns) + 1)
+    )
+    return (boats, *arrays)
+
+def _raceDataColumns(session, race_boat_ids: list) -> tuple:
+    """Returns arrays (boat position in race_boat_ids, distance, speed, stroke) sorted by position and distance"""
+    boats, distances, speeds, strokes = _columnsPerRaceBoat(
+        session, race_boat_ids, model.Race_Data,
+        (model.Race_Data.distance_meter, model.Race_Data.speed_meter_per_sec, model.Race_Data.stroke)
+    )
+    return boats, distances.astype(np.int64), speeds, strokes
+
+def _intermediatesSummary(session, race_boat_ids: list, race_data_columns: tuple) -> dict:
+    """The stats of a group per distance & metric as computed from getIntermediateTimes(),
+    calculateIntermediateTimes() and strokes_for_intermediate_steps() of every race boat"""
+    grid = np.array(prepare_grid(None, force_grid_resolution=500, course_length=2000))
+    boats, distances, ranks_, times_ = _columnsPerRaceBoat(
+        session, race_boat_ids, model.Intermediate_Time,
+        (model.Intermediate_Time.distance_meter, model.Intermediate_Time.rank, model.Intermediate_Time.result_time_ms),
+        model.Intermediate_Time.distance_meter.in_(grid.tolist())
+    )
+
+    # boats x grid; missing intermediates/values are 0 like in getIntermediateTimes()
+    ranks = np.zeros((len(race_boat_ids), len(grid)), dtype=np.int64)
+    times = np.zeros((len(race_boat_ids), len(grid)), dtype=np.int64)
+    columns = np.searchsorted(grid, distances.astype(np.int64))
+    ranks[boats, columns] = np.nan_to_num(ranks_)
+    times[boats, columns] = np.nan_to_num(times_)
+
+    paces = np.diff(times, axis=1, prepend=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        speeds = np.where(paces != 0, 500 / paces * 1000, 0.)
+        rel_speeds = np.where(paces != 0, times[:, -1:] / (4 * paces), 0.)
+
+    # mean stroke per boat and 500m step (statistics.fmean, i.e. math.fsum of the valid strokes)
+    boats, distances, _, strokes = race_data_columns
+    steps = ((distances - 1) // 500 + 1) * 500
+    in_grid = np.isin(steps, grid)
+    keys = boats[in_grid] * len(grid) + np.searchsorted(grid, steps[in_grid])
+    strokes = strokes[in_grid]
+    valid = ~np.isnan(strokes) & (strokes != 0)
+    stroke_means = np.full(times.shape, np.nan)
+    has_strokes = np.zeros(times.shape, dtype=bool)
+    if len(keys):
+        group_keys, starts = np.unique(keys, return_index=True)
+        counts = np.add.reduceat(valid.astype(np.int64), starts)
+        valid_strokes = np.where(valid, strokes, 0.).tolist()
+        ends = starts[1:].tolist() + [len(keys)]
+        sums = [math.fsum(valid_strokes[start:end]) for start, end in zip(starts.tolist(), ends)]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            means = np.where(counts > 0, np.array(sums) / counts, np.nan)
+        stroke_means.flat[group_keys] = means
+        has_strokes.flat[group_keys] = True
+
+    summary = {}
+    if not len(race_boat_ids):
+        return summary
+    metrics = {"rank": ranks, "time [millis]": times, "pace [millis]": paces, "speed [m/s]": speeds,
+               "rel_speed [%]": rel_speeds}
+    for column, distance in enumerate(grid.tolist()):
+        summary[distance] = {key: _confidenceIntervalDict(values[:, column]) for key, values in metrics.items()}
+        if has_strokes[:, column].any():
+            summary[distance]["stroke [1/min]"] = _confidenceIntervalDict(
+                stroke_means[has_strokes[:, column], column]
+            )
+    return summary
+
+def _raceDataSummary(race_data_columns: tuple, race_data_resolution: int = None) -> dict:
+    """The stats of a group per GPS distance & metric (speed, stroke, propulsion), distances ordered like in the
+    race_data of the race boats (first appearance). With race_data_resolution only multiples of it are included."""
+    boats, distances, speeds, strokes = race_data_columns
+    if race_data_resolution:
+        on_grid = distances % race_data_resolution == 0
+        boats, distances, speeds, strokes = boats[on_grid], distances[on_grid], speeds[on_grid], strokes[on_grid]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        # propulsion_in_meters_per_stroke()
+        propulsions = np.where(~np.isnan(speeds) & ~np.isnan(strokes) & (strokes != 0), 60 * speeds / strokes, np.nan)
+
+    summary = {}
+    if not len(distances):
+        return summary
+    _, first_index = np.unique(distances, return_index=True)
+    by_distance = np.lexsort((boats, distances))
+    group_distances, starts = np.unique(distances[by_distance], return_index=True)
+    ends = starts[1:].tolist() + [len(distances)]
+    groups = dict(zip(group_distances.tolist(), zip(starts.tolist(), ends)))
+    for distance in distances[np.sort(first_index)].tolist():
+        rows = by_distance[slice(*groups[distance])]
+        summary[str(distance)] = {
+            "speed [m/s]": _confidenceIntervalDict(speeds[rows]),
+            "stroke [1/min]": _confidenceIntervalDict(strokes[rows]),
+            "propulsion [m/stroke]": _confidenceIntervalDict(propulsions[rows])
+        }
+    return summary
+
+def raceBoatGroupSummary(session, race_boat_ids: list, race_data_resolution: int = None) -> tuple:
+    """
+    Summaries (stats, stats_race_data) of a race boat group for /get_race_boat_groups: mean and 95% confidence
+    interval per distance and metric. Computed from columnar arrays (two queries), independent of the size of
+    the group; same results as calculateConfidenceIntervall() applied to the per-boat figures.
+
+    Args:
+        race_boat_ids (List): ids of the race boats; the order determines the order of the sample data
+        race_data_resolution (int): stats_race_data only for GPS distances that are multiples of it (meters)
+    """
+    if not race_boat_ids:
+        return {}, {}
+    race_data_columns = _raceDataColumns(session, race_boat_ids)
+    return (
+        _intermediatesSummary(session, race_boat_ids, race_data_columns),
+        _raceDataSummary(race_data_columns, race_data_resolution)
+    )
+
 def getPacingProfile(t1: float, t2: float, t3: float, t4: float) -> str:
     """Identify Pacing Profile based on 500m times."""
     try:
@@ -337,6 +495,58 @@ def _getOlympicCycle(year: int):
         end_year = 2021
     return f"{start_year}-{end_year}"
 
+def _loadOzBestTimes(csv_path: str) -> MappingProxyType:
+    """
+    Parse wbt.csv into an immutable lookup table.
+
+    Returns:
+        Mapping: table[boat_class][olympic_cycle] -> best time in ms (empty cells are left out)
+    """
+    table = {}
+    with open(csv_path, mode="r", encoding="utf-8", newline="") as fp:
+        reader = csv.reader(fp)
+        olympic_cycles = next(reader)[1:]
+        for row in reader:
+            if not row:
+                continue
+            times = {}
+            for olympic_cycle, time in zip(olympic_cycles, row[1:]):
+                with suppress(ValueError):
+                    times[olympic_cycle] = _convertToMs(time)
+            table[row[0]] = MappingProxyType(times)
+    return MappingProxyType(table)
+
+# (mtime of wbt.csv, parsed table) // reloaded by getOzBestTimesTable() as soon as the file changes
+_oz_best_times_cache = (None, MappingProxyType({}))
+
+def getOzBestTimesTable() -> MappingProxyType:
+    """
+    Get the best times before each Olympic cycle from wbt.csv.
+    The file is parsed on first use and again only if its modification time changed.
+
+    Returns:
+        Mapping: table[boat_class][olympic_cycle] -> best time in ms (e.g. table["M1x"]["2022-2024"])
+    """
+    global _oz_best_times_cache
+    mtime = os.stat(WBT_CSV_PATH).st_mtime_ns
+    cached_mtime, table = _oz_best_times_cache
+    if cached_mtime != mtime:
+        table = _loadOzBestTimes(WBT_CSV_PATH)
+        _oz_best_times_cache = (mtime, table)
+    return table
+
+def getOzBestTimeBeforeCycle(boat_class: str, olympic_cycle: str) -> int:
+    """
+    Gets the best time (ms) of a boat class before the given Olympic cycle (e.g. 2022-2024).
+    U23/U19 boat classes are mapped to their elite boat class. Returns 0 if no time is known.
+    """
+    try:
+        table = getOzBestTimesTable()
+    except OSError as error:
+        logger.error(f"Could not read {WBT_CSV_PATH}: {error}")
+        return 0
+    return table.get(getEliteBoatClass(boat_class), {}).get(olympic_cycle, 0)
+
 def getOzBestTime(boat_class: str, year: int) -> int:
     """
     Gets the best time of a boat class before a specific Olympia Cycle.
@@ -344,25 +554,13 @@ def getOzBestTime(boat_class: str, year: int) -> int:
 
     Args:
         boat_class (String): boat class abbreviation (e.g. M1x)
-        column (String): olympia cycle period (e.g. 2022-2024)
-    
+        year (int): year within the olympia cycle period (e.g. 2023 -> 2022-2024)
+
     Returns:
-        String: best time in format 'M:SS,MS'    
+        int: best time in ms (0 if unknown)
     """
-    column_name = _getOlympicCycle(year)
-    try:
-        base_dir = os.path.dirname(__file__)              
-        csv_path = os.path.join(base_dir, '..', 'wbt.csv')
-        csv_path = os.path.abspath(csv_path) 
-
+    return getOzBestTimeBeforeCycle(boat_class, _getOlympicCycle(year))
 
-        df = pd.read_csv(csv_path, sep=',', index_col=0)
-        elite_boat_class = getEliteBoatClass(boat_class)
-        best_time = df.loc[elite_boat_class, column_name]
-        return _convertToMs(best_time)
-    except:
-        return 0
-    
 def _convertToMs(time: str) -> int:
     """Convert time with format 'M:SS,MS' to milliseconds."""
     time_format = "%M:%S,%f"
@@ -372,14 +570,7 @@ def _convertToMs(time: str) -> int:
 
 def getWorldBestTime(boat_class: str, session) -> int:
     """Get the world best time of a boat class in ms"""
-    elite_boat_class = getEliteBoatClass(boat_class)
-    statement = select(model.Boat_Class).where(model.Boat_Class.abbreviation == elite_boat_class)
-    boat_class_object = session.execute(statement).scalars().first()
-    world_best_race_boat = boat_class_object.world_best_race_boat
-    if world_best_race_boat:
-        return world_best_race_boat.result_time_ms
-    else:
-        return 0
+    return world_best_times.result_time_ms(session, getEliteBoatClass(boat_class), default=0)
     
 def getEliteBoatClass(boat_class: str) -> str:
     """Get the abbreviation of the elite boat class, e. g. BM1x -> M1x"""
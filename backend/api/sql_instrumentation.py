@@ -0,0 +1,165 @@
+"""
+Opt-in per-request SQL instrumentation for the Flask app (see init_app).
+
+Records the statements sent via model.engine while a request is handled: count, total DB time and the slowest
+statements. They are exposed as Server-Timing response header (visible in the browser dev tools) and logged as one
+line per request, e.g.:
+
+    sql endpoint="get_athlete" method=GET status=200 queries=97 db_ms=41.2 request_ms=69.1 slowest=[...]
+
+Query budgets fail requests with more statements than allowed (e.g. N+1 patterns): in strict mode (default for
+app.testing) Query_Budget_Exceeded is raised, i.e. the Flask test client raises it, otherwise a warning is logged.
+
+Configuration (app.config, defaults from the environment):
+* SQL_INSTRUMENTATION (API_SQL_INSTRUMENTATION='1'): header & log line
+* SQL_QUERY_BUDGET (API_SQL_QUERY_BUDGET): int, or dict endpoint -> int (key None -> all other endpoints).
+  Environment format: "get_race=4,get_athlete=10,100"
+* SQL_QUERY_BUDGET_STRICT (API_SQL_QUERY_BUDGET_STRICT='1'): raise instead of warn
+"""
+import os
+import time
+import heapq
+import itertools
+
+from flask import g, request, has_request_context
+from sqlalchemy import event
+
+from model import model
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+SQL_INSTRUMENTATION = os.environ.get('API_SQL_INSTRUMENTATION', '').strip() == '1'
+SQL_QUERY_BUDGET = os.environ.get('API_SQL_QUERY_BUDGET', '').strip()
+SQL_QUERY_BUDGET_STRICT = os.environ.get('API_SQL_QUERY_BUDGET_STRICT', '').strip() == '1'
+
+# number of statements listed in header & log line
+SLOWEST_STATEMENTS = 3
+# statements are truncated to this length
+STATEMENT_MAX_LENGTH = 200
+
+
+class Query_Budget_Exceeded(AssertionError):
+    pass
+
+
+class Request_Stats:
+    """SQL statements of one request"""
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.count = 0
+        self.db_seconds = 0.
+        self._slowest = [] # min-heap of (seconds, n, statement)
+        self._n = itertools.count()
+
+    def add(self, statement: str, seconds: float):
+        self.count += 1
+        self.db_seconds += seconds
+        entry = (seconds, next(self._n), statement)
+        if len(self._slowest) < SLOWEST_STATEMENTS:
+            heapq.heappush(self._slowest, entry)
+        elif seconds > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    def slowest(self) -> list:
+        """Returns list of (ms, statement), slowest first"""
+        return [
+            (round(seconds * 1000, 2), " ".join(statement.split())[:STATEMENT_MAX_LENGTH])
+            for seconds, _, statement in sorted(self._slowest, reverse=True)
+        ]
+
+
+def parse_query_budget(value):
+    """Parses the API_SQL_QUERY_BUDGET format ("get_race=4,get_athlete=10,100") to int or dict (None if empty)"""
+    if not value:
+        return None
+    budgets = {}
+    for item in value.split(","):
+        endpoint, _, budget = item.rpartition("=")
+        budgets[endpoint.strip() or None] = int(budget)
+    if list(budgets) == [None]:
+        return budgets[None]
+    return budgets
+
+
+def _query_budget(config, endpoint):
+    budget = config.get("SQL_QUERY_BUDGET")
+    if isinstance(budget, dict):
+        return budget.get(endpoint, budget.get(None))
+    return budget
+
+
+def _is_enabled(app) -> bool:
+    return bool(app.config.get("SQL_INSTRUMENTATION")) or app.config.get("SQL_QUERY_BUDGET") != None
+
+
+def _quote(text: str) -> str:
+    """Quoted string as in the Server-Timing header (RFC 7230)"""
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _request_stats():
+    return g.get("sql_stats") if has_request_context() else None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _request_stats() != None:
+        conn.info.setdefault("sql_instrumentation_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _request_stats()
+    started = conn.info.get("sql_instrumentation_started")
+    if stats != None and started:
+        stats.add(statement, time.perf_counter() - started.pop())
+
+
+def _handle_error(exception_context):
+    # after_cursor_execute is not called for failed statements
+    started = exception_context.connection.info.get("sql_instrumentation_started") \
+        if exception_context.connection != None else None
+    if _request_stats() != None and started:
+        started.pop()
+
+
+def init_app(app, engine=model.engine):
+    """Registers the instrumentation (inactive unless enabled by the configuration, see module docstring)"""
+    app.config.setdefault("SQL_INSTRUMENTATION", SQL_INSTRUMENTATION)
+    app.config.setdefault("SQL_QUERY_BUDGET", parse_query_budget(SQL_QUERY_BUDGET))
+    app.config.setdefault("SQL_QUERY_BUDGET_STRICT", SQL_QUERY_BUDGET_STRICT)
+
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+    @app.before_request
+    def start_sql_stats():
+        if _is_enabled(app):
+            g.sql_stats = Request_Stats()
+
+    @app.after_request
+    def report_sql_stats(response):
+        stats = g.pop("sql_stats", None)
+        if stats == None:
+            return response
+
+        request_ms = (time.perf_counter() - stats.started) * 1000
+        db_ms = stats.db_seconds * 1000
+        slowest = stats.slowest()
+        if app.config.get("SQL_INSTRUMENTATION"):
+            metrics = [f'db;dur={db_ms:.2f};desc={_quote(f"{stats.count} queries")}']
+            metrics += [f'sql-{n};dur={ms};desc={_quote(statement[:100])}' for n, (ms, statement) in enumerate(slowest, 1)]
+            response.headers.add("Server-Timing", ", ".join(metrics))
+            logger.info(
+                f'sql endpoint="{request.endpoint}" method={request.method} status={response.status_code} '
+                f'queries={stats.count} db_ms={db_ms:.2f} request_ms={request_ms:.2f} slowest={slowest}'
+            )
+
+        budget = _query_budget(app.config, request.endpoint)
+        if budget != None and stats.count > budget:
+            message = f'Endpoint "{request.endpoint}" sent {stats.count} SQL statements, budget is {budget}'
+            if app.config.get("SQL_QUERY_BUDGET_STRICT") or app.testing:
+                raise Query_Budget_Exceeded(message)
+            logger.warning(message)
+        return response
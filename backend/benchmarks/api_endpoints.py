@@ -0,0 +1,213 @@
+"""
+Micro-benchmarks for the Flask endpoints in api/app.py using the Flask test client, run against a synthetic database
+(see synthetic.seed_world_cups). /get_race is measured against a dedicated synthetic race (see setup_get_race).
+
+Usage (cwd is backend/, use a dedicated database!):
+
+    PGDATABASE=rowing_bench python -m benchmarks.api_endpoints --repeat 50
+    PGDATABASE=rowing_bench python -m benchmarks.api_endpoints --skip-seed --endpoint get_race --endpoint get_athlete
+    PGDATABASE=rowing_bench python -m benchmarks.api_endpoints --skip-seed --query-budget "get_race=5,100"
+    PGDATABASE=rowing_bench python -m benchmarks.api_endpoints --years 13 -e get_athlete --min-athlete-races 200 \
+        --query-budget "get_athlete=2"
+
+With --query-budget, a request exceeding its budget aborts the benchmark (see api/sql_instrumentation.py).
+"""
+import time
+import statistics
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import select, func
+
+from model import model, dbutils
+from api.app import app
+from api import sql_instrumentation
+from . import synthetic
+from .utils import Query_Counter, percentile
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+NATION = "S01"
+ENDPOINTS = ("get_race", "get_race_boat_groups", "get_race_boat_groups_summary", "get_report_boat_class",
+             "get_medals", "get_teams", "matrix", "competition_matrix", "get_athlete")
+
+
+def run_endpoint(client, headers, method, url, json=None, repeat=20):
+    """Returns dict with latency figures in ms and the number of queries of a single (warm) request"""
+    durations = []
+    queries = None
+    for _ in range(repeat):
+        with Query_Counter() as counter:
+            start = time.perf_counter()
+            response = client.open(url, method=method, headers=headers, json=json)
+            durations.append((time.perf_counter() - start) * 1000)
+        if response.status_code != 200:
+            raise RuntimeError(f"{method} {url} returned status {response.status_code}")
+        queries = counter.count
+
+    durations.sort()
+    return {
+        "url": url,
+        "n": repeat,
+        "p50_ms": round(percentile(durations, .5), 2),
+        "p95_ms": round(percentile(durations, .95), 2),
+        "mean_ms": round(statistics.fmean(durations), 2),
+        "queries": queries
+    }
+
+
+def setup_get_race(lanes=8, gps_points=40) -> int:
+    """Creates a synthetic race and returns its id. Its competition type is not a World Cup, so it does not show up
+    in the requests of the other endpoints."""
+    with model.Scoped_Session() as session:
+        competition = synthetic.create_competition(session, competition_type="Benchmark")
+        event_ = synthetic.create_event(session, competition)
+        race = synthetic.create_race(session, event_, lanes=lanes, gps_points=gps_points)
+        session.commit()
+        return race.id
+
+
+def _dataset() -> dict:
+    """Looks up the ids the requests refer to in the seeded data"""
+    with model.Scoped_Session() as session:
+        competition_types = session.execute(
+            select(model.Competition_Type.abbreviation, model.Competition_Type.additional_id_)
+            .where(model.Competition_Type.abbreviation.in_(synthetic.WORLD_CUP_TYPES))
+        ).all()
+        if not competition_types:
+            raise RuntimeError("No synthetic data found, run without --skip-seed first")
+        start_year, end_year = session.execute(
+            select(func.min(model.Competition.year), func.max(model.Competition.year))
+            .join(model.Competition.competition_type)
+            .where(model.Competition_Type.abbreviation.in_(synthetic.WORLD_CUP_TYPES))
+        ).one()
+        # the athlete with the most races
+        athlete_id, athlete_races = session.execute(
+            select(model.Association_Race_Boat_Athlete.athlete_id, func.count())
+            .group_by(model.Association_Race_Boat_Athlete.athlete_id)
+            .order_by(func.count().desc())
+        ).first()
+
+    return {
+        "interval": [start_year, end_year],
+        "competition_types": [abbreviation for abbreviation, _ in competition_types],
+        "competition_type_ids": [uuid for _, uuid in competition_types],
+        "athlete_id": athlete_id,
+        "athlete_races": athlete_races
+    }
+
+
+def requests_(dataset: dict) -> dict:
+    """Returns {endpoint: (method, url, json)}; get_race_boat_groups_summary omits the per-boat detail"""
+    interval = dataset["interval"]
+    boat_classes = [boat_class for boat_class, _, _ in synthetic.WORLD_CUP_BOAT_CLASSES]
+    race_boat_groups = {
+        "boat_class": "M1x",
+        "groups": [{
+            "start_year": interval[0],
+            "end_year": interval[1],
+            "country": NATION,
+            "events": dataset["competition_types"],
+            "placements": [1, 2, 3, 4, 5, 6],
+            "phases": ["heat", "final A", "final B"]
+        }]
+    }
+    return {
+        "get_race": ("GET", f"/get_race/{dataset.get('race_id')}/", None),
+        "get_race_boat_groups": ("POST", "/get_race_boat_groups", {"data": race_boat_groups}),
+        "get_race_boat_groups_summary": ("POST", "/get_race_boat_groups", {"data": {
+            **race_boat_groups,
+            "include_race_boats": False
+        }}),
+        "get_report_boat_class": ("POST", "/get_report_boat_class", {"data": {
+            "interval": interval,
+            "competition_type": dataset["competition_type_ids"],
+            "boat_class": "M1x",
+            "race_phase_type": ["heat", "final"],
+            "race_phase_subtype": [],
+            "placement": []
+        }}),
+        "get_medals": ("POST", "/get_medals", {"data": {
+            "years": interval,
+            "nations": [f"S{lane:02d}" for lane in range(1, 7)],
+            "competition_type": dataset["competition_type_ids"]
+        }}),
+        "get_teams": ("POST", "/get_teams", {"data": {
+            "interval": interval,
+            "nation": NATION,
+            "competition_categories": dataset["competition_type_ids"]
+        }}),
+        "matrix": ("POST", "/matrix", {"data": {
+            "boat_class": boat_classes,
+            "interval": interval,
+            "competition_type": dataset["competition_type_ids"]
+        }}),
+        "competition_matrix": ("POST", "/competition_matrix", {"data": {
+            "interval": interval,
+            "competition_type": dataset["competition_types"]
+        }}),
+        "get_athlete": ("GET", f"/get_athlete/{dataset['athlete_id']}", None)
+    }
+
+
+def main(repeat=20, lanes=8, gps_points=40, years=10, first_year=2014, heats=2, world_cup_lanes=6,
+         world_cup_gps_points=40, skip_seed=False, endpoints=None, query_budget=None, min_athlete_races=0):
+    dbutils.create_tables(model.engine)
+    if query_budget:
+        app.config["SQL_QUERY_BUDGET"] = sql_instrumentation.parse_query_budget(query_budget)
+        app.config["SQL_QUERY_BUDGET_STRICT"] = True
+        app.config["PROPAGATE_EXCEPTIONS"] = True # raise Query_Budget_Exceeded instead of answering with 500
+    if not skip_seed:
+        synthetic.seed_world_cups(years=years, first_year=first_year, heats=heats, lanes=world_cup_lanes,
+                                  gps_points=world_cup_gps_points)
+
+    client = app.test_client()
+    with app.app_context():
+        headers = {"Authorization": f"Bearer {create_access_token(identity='benchmark')}"}
+
+    dataset = _dataset()
+    if not endpoints or "get_race" in endpoints:
+        dataset["race_id"] = setup_get_race(lanes=lanes, gps_points=gps_points)
+    logger.info(f"Dataset {dataset}")
+    if dataset["athlete_races"] < min_athlete_races:
+        raise RuntimeError(f"Athlete {dataset['athlete_id']} has {dataset['athlete_races']} races, "
+                           f"expected at least {min_athlete_races} (seed more --years)")
+    results = []
+    for endpoint, (method, url, json) in requests_(dataset).items():
+        if endpoints and not endpoint in endpoints:
+            continue
+        results.append({"endpoint": endpoint, **run_endpoint(client, headers, method, url, json=json, repeat=repeat)})
+        model.Scoped_Session.remove()
+
+    for result in results:
+        logger.info(result)
+    return results
+
+
+if __name__ == '__main__':
+    import argparse
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-r", "--repeat", help="Requests per endpoint", type=int, default=20)
+    parser.add_argument("-e", "--endpoint", help="Endpoint to benchmark (default: all)", choices=ENDPOINTS,
+                        action="append")
+    parser.add_argument("--lanes", help="Boats of the synthetic race of /get_race", type=int, default=8)
+    parser.add_argument("--gps-points", help="GPS data points per boat of the race of /get_race", type=int, default=40)
+    parser.add_argument("--years", help="Years of synthetic World Cups", type=int, default=10)
+    parser.add_argument("--first-year", help="First year of the synthetic World Cups", type=int, default=2014)
+    parser.add_argument("--heats", help="Heats per event (plus finals A and B)", type=int, default=2)
+    parser.add_argument("--world-cup-lanes", help="Boats per synthetic World Cup race", type=int, default=6)
+    parser.add_argument("--world-cup-gps-points", help="GPS data points per boat of the World Cups", type=int,
+                        default=40)
+    parser.add_argument("--skip-seed", help="Use the data seeded by a previous run", action="store_true")
+    parser.add_argument("--query-budget", help='Max. SQL statements per request, e.g. "get_race=5,get_athlete=10,100"')
+    parser.add_argument("--min-athlete-races", help="Abort unless the athlete of /get_athlete has this many races",
+                        type=int, default=0)
+    args = parser.parse_args()
+
+    main(repeat=args.repeat, lanes=args.lanes, gps_points=args.gps_points, years=args.years,
+         first_year=args.first_year, heats=args.heats, world_cup_lanes=args.world_cup_lanes,
+         world_cup_gps_points=args.world_cup_gps_points, skip_seed=args.skip_seed, endpoints=args.endpoint,
+         query_budget=args.query_budget, min_athlete_races=args.min_athlete_races)
@@ -0,0 +1,106 @@
+"""
+Compares the wall time of the outlier marking modes (scraper_procedures/outlier_detection.py):
+"rowwise" (one UPDATE + commit per outlier) vs. "bulk" (one UPDATE ... FROM per table and boat class).
+Both modes run on the same data; the benchmark also reports whether they marked the same rows.
+
+Usage (cwd is backend/, use a dedicated database!):
+
+    PGDATABASE=rowing_bench python -m benchmarks.outlier_detection --competitions 20
+    PGDATABASE=rowing_copy python -m benchmarks.outlier_detection --skip-seed
+"""
+import time
+import random
+
+from sqlalchemy import select
+
+from model import model, dbutils
+from scraper_procedures import postprocessing
+from . import synthetic
+from .utils import Query_Counter
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+BOAT_CLASSES = (("M1x", "Men"), ("W1x", "Women"), ("M2-", "Men"))
+COMPETITION_CATEGORIES = ("Elite", "U23")
+
+
+def seed(competitions=10, races_per_event=4, lanes=6, gps_points=50):
+    """Creates `competitions` synthetic competitions (alternating competition categories), each with one event per
+    boat class in BOAT_CLASSES"""
+    rng = random.Random(0)
+    with model.Scoped_Session() as session:
+        for n in range(competitions):
+            category = COMPETITION_CATEGORIES[n % len(COMPETITION_CATEGORIES)]
+            competition = synthetic.create_competition(session, year=2000 + n, competition_type=f"{category} Cup",
+                                                       competition_category=category)
+            for boat_class, gender in BOAT_CLASSES:
+                event = synthetic.create_event(session, competition, boat_class=boat_class, gender=gender)
+                for phase_number in range(1, races_per_event+1):
+                    synthetic.create_race(session, event, lanes=lanes, gps_points=gps_points, phase_type="heat",
+                                          phase_number=phase_number, rng=rng,
+                                          base_time_ms=rng.randint(380_000, 420_000))
+            session.commit()
+            logger.info(f"Seeded competition {n+1}/{competitions}")
+
+
+def _outliers(session) -> tuple:
+    intermediates = session.execute(
+        select(model.Intermediate_Time.race_boat_id, model.Intermediate_Time.distance_meter)
+        .where(model.Intermediate_Time.is_outlier == True)
+    ).all()
+    race_data = session.execute(
+        select(model.Race_Data.race_boat_id, model.Race_Data.distance_meter)
+        .where(model.Race_Data.is_outlier == True)
+    ).all()
+    return set(intermediates), set(race_data)
+
+
+def run_mode(mode) -> tuple:
+    """Returns (result dict, marked outliers)"""
+    with Query_Counter() as counter:
+        start = time.perf_counter()
+        postprocessing.mark_outliers(session=None, mode=mode)
+        duration = time.perf_counter() - start
+
+    with model.Scoped_Session() as session:
+        intermediates, race_data = _outliers(session)
+
+    result = {
+        "mode": mode,
+        "seconds": round(duration, 3),
+        "queries": counter.count,
+        "intermediate_outliers": len(intermediates),
+        "race_data_outliers": len(race_data)
+    }
+    return result, (intermediates, race_data)
+
+
+def main(competitions=10, skip_seed=False):
+    dbutils.create_tables(model.engine)
+    if not skip_seed:
+        seed(competitions=competitions)
+
+    results, outliers = [], []
+    for mode in ("rowwise", "bulk"):
+        result, marked = run_mode(mode)
+        results.append(result)
+        outliers.append(marked)
+
+    for result in results:
+        logger.info(result)
+    logger.info(f"Same rows marked by both modes: {outliers[0] == outliers[1]}")
+    return results
+
+
+if __name__ == '__main__':
+    import argparse
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-c", "--competitions", help="Synthetic competitions to seed", type=int, default=10)
+    parser.add_argument("--skip-seed", help="Run on the data already present in the database", action="store_true")
+    args = parser.parse_args()
+
+    main(competitions=args.competitions, skip_seed=args.skip_seed)
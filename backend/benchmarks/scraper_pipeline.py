@@ -0,0 +1,287 @@
+"""
+End-to-end benchmark of the scraper pipeline (prescrape -> scrape -> postprocess, see scraper.py) on a fixed dataset:
+World Rowing API responses and PDFs recorded with `python scraper.py --record DIR` (see scraping_wr/recorder.py) are
+replayed, i.e. there are no network requests.
+
+Reports per stage: wall time (incl. and excl. nested stages), calls, SQL statements (DB round trips), rows written
+(INSERT/UPDATE/DELETE) and peak RSS. Statements and rows are attributed to the innermost running stage (ORM changes to the stage that flushes them, e.g.
+the commit in scrape instead of pdf_injection). Results are
+written as JSON (--output) to compare runs across commits.
+
+Stages:
+    prescrape
+        prescrape/api_json              utils_wr.load_json()
+    scrape
+        scrape/api_json
+        scrape/json_mapping             dbutils.wr_map_competition_scrape()
+        scrape/pdf_parse                PDF extractors (camelot & co.)
+        scrape/pdf_parse/pdf_download   pdf_cache.fetch()
+        scrape/pdf_injection            scraping._inject_pdf_*()
+    postprocess
+        postprocess/bubble_down
+        postprocess/wbt_refresh
+        postprocess/api_json
+        postprocess/outlier_marking
+
+PDFs are parsed in this process by default (--pdf-processes 0). With a process pool, download and parse happen in the
+pool, i.e. they are not timed (the pool would have to pickle the wrapped functions) and count towards scrape. The JSON/PDF caches are disabled unless --with-caches is given.
+
+Usage (cwd is backend/, use a dedicated database!). The scraper config (e.g. SCRAPER_YEAR_MIN/MAX) has to match the
+recording, otherwise requests are missing in the fixtures (see the fixture stats):
+
+    python scraper.py --record ../fixtures
+    PGDATABASE=rowing_bench python -m benchmarks.scraper_pipeline --fixtures ../fixtures --reset-db --output run.json
+"""
+import os
+import sys
+import json
+import time
+import datetime
+import resource
+import threading
+import subprocess
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from model import model, dbutils
+from scraping_wr import utils_wr, pdf_cache, json_cache, recorder, pdf_result, pdf_race_data
+from scraper_procedures import prescraping, scraping, postprocessing
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# (module, attribute, stage name): functions that are timed as a stage
+STAGE_FUNCTIONS = (
+    (prescraping, "prescrape", "prescrape"),
+    (scraping, "scrape", "scrape"),
+    (postprocessing, "postprocess", "postprocess"),
+    (utils_wr, "load_json", "api_json"),
+    (dbutils, "wr_map_competition_scrape", "json_mapping"),
+    (pdf_result, "extract_data_from_pdf_urls", "pdf_parse"),
+    (pdf_race_data, "extract_data_from_pdf_url", "pdf_parse"),
+    (pdf_cache, "fetch", "pdf_download"),
+    (scraping, "_inject_pdf_intermediates", "pdf_injection"),
+    (scraping, "_inject_pdf_race_data", "pdf_injection"),
+    (postprocessing, "bubble_down_2km_intermediate_", "bubble_down"),
+    (postprocessing, "refresh_world_best_times", "wbt_refresh"),
+    (postprocessing, "mark_outliers", "outlier_marking"),
+)
+
+WRITE_STATEMENTS = ("INSERT", "UPDATE", "DELETE")
+
+
+def _rss_bytes() -> int:
+    """Current resident set size (Linux) or the peak so far (other platforms)"""
+    try:
+        with open("/proc/self/statm") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss: KB on Linux, bytes on macOS
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+
+
+class Stage_Profiler:
+    """Times stages (nested per thread) and attributes SQL statements, written rows and RSS to them"""
+    def __init__(self, stage_functions=STAGE_FUNCTIONS, engine=model.engine, rss_interval=.02):
+        self.stage_functions = stage_functions
+        self.engine = engine
+        self.rss_interval = rss_interval
+        self.stages = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._root = None # top-level stage; parent of stages running in worker threads
+        self._active = {} # stage path -> number of running calls
+        self._patched = []
+        self._sampler = None
+        self._stop = threading.Event()
+
+    def _stack(self) -> list:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def _stats(self, path) -> dict:
+        if not path in self.stages:
+            self.stages[path] = {
+                "seconds": 0., "self_seconds": 0., "calls": 0, "queries": 0, "rows_written": 0, "peak_rss_mb": 0.
+            }
+        return self.stages[path]
+
+    @contextmanager
+    def stage(self, name):
+        stack = self._stack()
+        parent = stack[-1]["path"] if stack else self._root
+        path = f"{parent}/{name}" if parent else name
+        frame = {"path": path, "children": 0.}
+        stack.append(frame)
+        with self._lock:
+            if parent == None:
+                self._root = path
+            self._active[path] = self._active.get(path, 0) + 1
+            stats = self._stats(path)
+            stats["peak_rss_mb"] = max(stats["peak_rss_mb"], _rss_bytes() / 1024 / 1024)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            stack.pop()
+            if stack:
+                stack[-1]["children"] += duration
+            with self._lock:
+                stats = self._stats(path)
+                stats["seconds"] += duration
+                stats["self_seconds"] += duration - frame["children"]
+                stats["calls"] += 1
+                self._active[path] -= 1
+                if parent == None:
+                    self._root = None
+
+    def _current_path(self):
+        stack = self._stack()
+        return stack[-1]["path"] if stack else self._root
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        path = self._current_path()
+        if path == None:
+            return
+        rows = 0
+        if statement.lstrip().upper().startswith(WRITE_STATEMENTS):
+            if executemany and statement.lstrip().upper().startswith("INSERT"):
+                rows = len(parameters)
+            else:
+                rows = max(cursor.rowcount, 0)
+        with self._lock:
+            stats = self._stats(path)
+            stats["queries"] += 1
+            stats["rows_written"] += rows
+
+    def _sample_rss(self):
+        while not self._stop.wait(self.rss_interval):
+            rss_mb = _rss_bytes() / 1024 / 1024
+            with self._lock:
+                for path, running in self._active.items():
+                    if running > 0:
+                        stats = self._stats(path)
+                        stats["peak_rss_mb"] = max(stats["peak_rss_mb"], rss_mb)
+
+    def _wrap(self, func, name):
+        profiler = self
+        def wrapper(*args, **kwargs):
+            with profiler.stage(name):
+                return func(*args, **kwargs)
+        wrapper.__wrapped__ = func
+        return wrapper
+
+    def __enter__(self):
+        for module, attribute, name in self.stage_functions:
+            func = getattr(module, attribute)
+            self._patched.append((module, attribute, func))
+            setattr(module, attribute, self._wrap(func, name))
+        event.listen(self.engine, "after_cursor_execute", self._on_execute)
+        self._stop.clear()
+        self._sampler = threading.Thread(target=self._sample_rss, name="rss-sampler", daemon=True)
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._sampler.join()
+        event.remove(self.engine, "after_cursor_execute", self._on_execute)
+        for module, attribute, func in reversed(self._patched):
+            setattr(module, attribute, func)
+        self._patched = []
+
+    def results(self) -> dict:
+        with self._lock:
+            return {
+                path: {
+                    **stats,
+                    "seconds": round(stats["seconds"], 3),
+                    "self_seconds": round(stats["self_seconds"], 3),
+                    "peak_rss_mb": round(stats["peak_rss_mb"], 1)
+                }
+                for path, stats in self.stages.items()
+            }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(fixtures, reset_db=False, with_caches=False, pdf_processes=0, workers=1, output=None):
+    recorder.configure("replay", fixtures)
+    if not with_caches:
+        json_cache.JSON_CACHE_DIR = ""
+        pdf_cache.PDF_CACHE_DIR = ""
+    scraping.SCRAPER_PDF_PARSER_PROCESSES = pdf_processes
+
+    if reset_db:
+        logger.info("Reset database")
+        dbutils.drop_all_tables(model.engine)
+    dbutils.create_tables(model.engine)
+
+    stage_functions = STAGE_FUNCTIONS
+    if pdf_processes > 0:
+        stage_functions = [f for f in STAGE_FUNCTIONS if not f[0] in (pdf_result, pdf_race_data, pdf_cache)]
+
+    start = time.perf_counter()
+    with Stage_Profiler(stage_functions) as profiler:
+        prescraping.prescrape()
+        scraping.scrape(parse_pdf=True, workers=workers)
+        postprocessing.postprocess()
+    duration = time.perf_counter() - start
+
+    ru_maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    results = {
+        "commit": _git_commit(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+        "config": {
+            "fixtures": os.path.abspath(fixtures),
+            "reset_db": reset_db,
+            "with_caches": with_caches,
+            "pdf_processes": pdf_processes,
+            "workers": workers
+        },
+        "total": {"seconds": round(duration, 3), "peak_rss_mb": round(ru_maxrss / 1024 / 1024, 1)},
+        "fixtures": dict(recorder.stats),
+        "pdf_cache": pdf_cache.stats_snapshot(),
+        "stages": profiler.results()
+    }
+
+    for path, stats in sorted(results["stages"].items()):
+        logger.info(f"{path:<32} {stats}")
+    logger.info(f"total {results['total']} fixtures {results['fixtures']}")
+    if recorder.stats["missing"]:
+        logger.warning("Requests missing in the fixtures; results are not comparable to a complete recording")
+
+    if output:
+        with open(output, mode="w", encoding="utf-8") as fp:
+            json.dump(results, fp, indent=2)
+        logger.info(f"Results written to {output}")
+    return results
+
+
+if __name__ == '__main__':
+    import argparse
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fixtures", help="Directory recorded with `scraper.py --record`", required=True)
+    parser.add_argument("--reset-db", help="Drop all tables first (reproducible first scrape)", action="store_true")
+    parser.add_argument("--with-caches", help="Keep the JSON/PDF caches enabled", action="store_true")
+    parser.add_argument("--pdf-processes", help="PDF parser processes (0 -> parse in the scraper thread)",
+                        type=int, default=0)
+    parser.add_argument("-w", "--workers", help="Scraper workers", type=int, default=1)
+    parser.add_argument("-o", "--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    main(fixtures=args.fixtures, reset_db=args.reset_db, with_caches=args.with_caches,
+         pdf_processes=args.pdf_processes, workers=args.workers, output=args.output)
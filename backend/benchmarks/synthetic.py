@@ -0,0 +1,149 @@
+"""
+Generates synthetic rowing data directly via the ORM (see model/model.py).
+Intended for benchmarks only: point PGDATABASE to a dedicated database.
+"""
+import uuid
+import random
+import datetime as dt
+
+from sqlalchemy import select
+
+from model import model
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+def _uuid():
+    return str(uuid.uuid4())
+
+
+def get_or_create_(session, Entity_Class, defaults=None, **filters):
+    """Returns the first entity matching the filters or creates it (using defaults as additional fields)."""
+    statement = select(Entity_Class).filter_by(**filters)
+    entity = session.execute(statement).scalars().first()
+    if entity == None:
+        entity = Entity_Class(additional_id_=_uuid(), **filters, **(defaults or {}))
+        session.add(entity)
+    return entity
+
+
+def create_competition(session, year=2022, name=None, competition_type="WCp 1", competition_category="Elite",
+                       country_code="GER"):
+    country = get_or_create_(session, model.Country, country_code=country_code, defaults={"name": country_code})
+    category = get_or_create_(session, model.Competition_Category, name=competition_category)
+    comp_type = get_or_create_(session, model.Competition_Type, abbreviation=competition_type,
+                               defaults={"name": competition_type, "competition_category": category})
+    venue = model.Venue(additional_id_=_uuid(), country=country, city="Synthetic City", site="Synthetic Lake")
+    start_date = dt.datetime(year, 6, 1)
+    competition = model.Competition(
+        additional_id_=_uuid(),
+        scraper_maintenance_level=model.Enum_Maintenance_Level.world_rowing_api_scraped.value,
+        scraper_data_provider=model.Enum_Data_Provider.world_rowing.value,
+        competition_type=comp_type,
+        venue=venue,
+        name=name or f"{year} Synthetic {competition_type}",
+        year=year,
+        start_date=start_date,
+        end_date=start_date + dt.timedelta(days=3),
+        is_fisa=True
+    )
+    session.add(competition)
+    return competition
+
+
+def create_event(session, competition, boat_class="M1x", gender="Men"):
+    boat_class_ = get_or_create_(session, model.Boat_Class, abbreviation=boat_class)
+    gender_ = get_or_create_(session, model.Gender, name=gender)
+    event = model.Event(additional_id_=_uuid(), name=f"{gender} {boat_class}", competition=competition,
+                        boat_class=boat_class_, gender=gender_)
+    session.add(event)
+    return event
+
+
+def create_race(session, event, lanes=8, gps_points=40, athletes_per_boat=1, phase_type="final", phase_number=1,
+                date=None, base_time_ms=400_000, rng=None, athletes=None):
+    """Creates a race with `lanes` boats, each with 500m intermediates and `gps_points` GPS (race data) points.
+    Countries are taken from (or created as) S01, S02, ...
+    Pass a dict as `athletes` to reuse athletes across races: key (country code, event name, boat position)."""
+    rng = rng or random.Random(0)
+    race = model.Race(
+        additional_id_=_uuid(),
+        event=event,
+        name=f"{event.name} {phase_type} {phase_number}",
+        date=date or event.competition.start_date,
+        phase_type=phase_type,
+        phase_number=phase_number,
+        progression="1-3->FA, 4..->R",
+        race_nr__="1"
+    )
+    session.add(race)
+
+    for lane in range(1, lanes+1):
+        country = get_or_create_(session, model.Country, country_code=f"S{lane:02d}", defaults={"name": f"Synthetic {lane}"})
+        race_boat = model.Race_Boat(additional_id_=_uuid(), race=race, country=country, name=country.country_code,
+                                    lane=lane, rank=lane)
+        session.add(race_boat)
+
+        for position in range(1, athletes_per_boat+1):
+            key = (country.country_code, event.name, position)
+            athlete = athletes.get(key) if athletes != None else None
+            if athlete == None:
+                athlete = model.Athlete(additional_id_=_uuid(), name=f"SYNTHETIC, Athlete {lane}-{position}",
+                                        first_name__=f"Athlete {lane}-{position}", last_name__="SYNTHETIC",
+                                        birthdate=dt.date(1995, 1, 1))
+                if athletes != None:
+                    athletes[key] = athlete
+            race_boat.athletes.append(
+                model.Association_Race_Boat_Athlete(athlete=athlete, boat_position=str(position))
+            )
+
+        result_time_ms = base_time_ms + lane * 1000 + rng.randint(0, 999)
+        for distance in (500, 1000, 1500, 2000):
+            race_boat.intermediates.append(model.Intermediate_Time(
+                distance_meter=distance,
+                rank=lane,
+                result_time_ms=int(result_time_ms * distance / 2000),
+                data_source=model.Enum_Data_Source.world_rowing_api.value,
+                is_outlier=False
+            ))
+        race_boat.result_time_ms = result_time_ms
+
+        step = 2000 // gps_points if gps_points else 2000
+        for n in range(1, gps_points+1):
+            race_boat.race_data.append(model.Race_Data(
+                distance_meter=n * step,
+                speed_meter_per_sec=round(rng.uniform(4.5, 6.0), 2),
+                stroke=round(rng.uniform(32., 44.), 1),
+                data_source=model.Enum_Data_Source.world_rowing_pdf.value,
+                is_outlier=False
+            ))
+    return race
+
+
+# (competition type, boat classes as (abbreviation, gender, athletes per boat)) of seed_world_cups()
+WORLD_CUP_TYPES = ("WCp 1", "WCp 2", "WCp 3", "WCH")
+WORLD_CUP_BOAT_CLASSES = (("M1x", "Men", 1), ("W1x", "Women", 1), ("M2-", "Men", 2), ("W4x", "Women", 4))
+
+
+def seed_world_cups(years=10, first_year=2014, heats=2, lanes=6, gps_points=40, seed=0):
+    """Creates one competition per year and type in WORLD_CUP_TYPES (category Elite), each with one event per boat
+    class in WORLD_CUP_BOAT_CLASSES. Every event has `heats` heats and the finals A and B. Athletes are reused
+    across races and years (one crew per country and boat class). Commits once per competition."""
+    rng = random.Random(seed)
+    athletes = {}
+    with model.Scoped_Session() as session:
+        for year in range(first_year, first_year + years):
+            for competition_type in WORLD_CUP_TYPES:
+                competition = create_competition(session, year=year, competition_type=competition_type,
+                                                 competition_category="Elite")
+                for boat_class, gender, athletes_per_boat in WORLD_CUP_BOAT_CLASSES:
+                    event = create_event(session, competition, boat_class=boat_class, gender=gender)
+                    phases = [("heat", n) for n in range(1, heats+1)] + [("final", 1), ("final", 2)]
+                    for day, (phase_type, phase_number) in enumerate(phases):
+                        create_race(session, event, lanes=lanes, gps_points=gps_points,
+                                    athletes_per_boat=athletes_per_boat, phase_type=phase_type,
+                                    phase_number=phase_number, date=competition.start_date + dt.timedelta(days=day),
+                                    base_time_ms=rng.randint(380_000, 420_000), rng=rng, athletes=athletes)
+                session.commit()
+            logger.info(f"Seeded year {year} ({year - first_year + 1}/{years})")
@@ -0,0 +1,29 @@
+"""
+Helpers shared by the benchmarks. Must not depend on the API (Flask) or scraper packages.
+"""
+from sqlalchemy import event
+
+from model import model
+
+
+class Query_Counter:
+    """Counts SQL statements sent to the database via model.engine"""
+    def __init__(self, engine=model.engine):
+        self.engine = engine
+        self.count = 0
+
+    def _on_execute(self, *args, **kwargs):
+        self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        event.listen(self.engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._on_execute)
+
+
+def percentile(sorted_values, q):
+    idx = min(len(sorted_values)-1, round(q * (len(sorted_values)-1)))
+    return sorted_values[idx]
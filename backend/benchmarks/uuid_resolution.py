@@ -0,0 +1,123 @@
+"""
+Compares the ingestion of a recorded competition payload (World Rowing API, everything included, e.g.
+doc/examples/competition.json):
+* "single": ORM mappers, one SELECT per dbutils.wr_insert() call
+* "batched": ORM mappers within dbutils.batched_uuid_resolution(), one IN (...) query per entity class
+* "bulk": bulk upsert engine, dbutils.wr_bulk_upsert_competition()
+
+Each mode maps the payload twice: "insert" (first scrape) and "update" (rescrape of the same payload). Both passes run
+in one transaction that is rolled back afterwards, i.e. the database is left unchanged. The benchmark also reports
+whether all modes wrote the same rows.
+
+Usage (cwd is backend/):
+
+    PGDATABASE=rowing_bench python -m benchmarks.uuid_resolution --json ../doc/examples/competition.json
+"""
+import json
+import time
+from contextlib import nullcontext
+
+from sqlalchemy import select
+
+from model import model, dbutils
+from .utils import Query_Counter
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+MODES = ("single", "batched", "bulk")
+
+
+def _snapshot(session, competition_id) -> tuple:
+    """Returns the mapped rows of the competition (by uuid, since ids differ between runs)"""
+    race_boats = session.execute(
+        select(model.Race.additional_id_, model.Race_Boat.additional_id_, model.Race_Boat.name,
+               model.Race_Boat.result_time_ms, model.Race_Boat.rank, model.Country.additional_id_)
+        .join(model.Race.event).join(model.Race.race_boats).outerjoin(model.Race_Boat.country)
+        .where(model.Event.competition_id == competition_id)
+    ).all()
+    athletes = session.execute(
+        select(model.Race_Boat.additional_id_, model.Athlete.additional_id_,
+               model.Association_Race_Boat_Athlete.boat_position)
+        .join(model.Race_Boat.athletes).join(model.Association_Race_Boat_Athlete.athlete)
+        .join(model.Race_Boat.race).join(model.Race.event)
+        .where(model.Event.competition_id == competition_id)
+    ).all()
+    intermediates = session.execute(
+        select(model.Race_Boat.additional_id_, model.Intermediate_Time.distance_meter,
+               model.Intermediate_Time.result_time_ms, model.Intermediate_Time.rank)
+        .join(model.Race_Boat.intermediates).join(model.Race_Boat.race).join(model.Race.event)
+        .where(model.Event.competition_id == competition_id)
+    ).all()
+    return sorted(race_boats, key=repr), sorted(athletes, key=repr), sorted(intermediates, key=repr)
+
+
+def run_mode(competition_data: dict, mode: str) -> tuple:
+    """Returns (result dict, snapshot of the mapped rows)"""
+    result = {"mode": mode}
+    with model.Scoped_Session() as session:
+        uuid = competition_data['id'].lower()
+        competition = dbutils.query_by_uuid_(session, model.Competition, uuid)
+        if competition == None:
+            # as created by the prescraper
+            competition = model.Competition(
+                additional_id_=uuid,
+                scraper_maintenance_level=model.Enum_Maintenance_Level.world_rowing_api_prescraped.value
+            )
+            session.add(competition)
+            session.flush()
+
+        try:
+            for phase in ("insert", "update"):
+                uuid_resolution = nullcontext()
+                with Query_Counter() as counter:
+                    start = time.perf_counter()
+                    if mode == "bulk":
+                        dbutils.wr_bulk_upsert_competition(session, competition_data)
+                    else:
+                        if mode == "batched":
+                            uuid_resolution = dbutils.batched_uuid_resolution(session, competition_data)
+                        with uuid_resolution:
+                            dbutils.wr_map_competition_scrape(session, competition, competition_data)
+                    session.flush()
+                    duration = time.perf_counter() - start
+                result[f"{phase}_seconds"] = round(duration, 3)
+                result[f"{phase}_queries"] = counter.count
+            snapshot = _snapshot(session, competition.id)
+        finally:
+            session.rollback()
+    return result, snapshot
+
+
+def main(json_path, repeat=3):
+    dbutils.create_tables(model.engine)
+    with open(json_path, mode="r", encoding="utf-8") as fp:
+        competition_data = json.load(fp)
+
+    results, snapshots = {}, {}
+    for _ in range(repeat):
+        for mode in MODES:
+            result, snapshots[mode] = run_mode(competition_data, mode)
+            # keep the fastest run
+            if mode not in results or result["insert_seconds"] < results[mode]["insert_seconds"]:
+                results[mode] = result
+
+    for result in results.values():
+        logger.info(result)
+    for mode in MODES[1:]:
+        logger.info(f"Same rows written by {MODES[0]} and {mode}: {snapshots[MODES[0]] == snapshots[mode]}")
+    return list(results.values())
+
+
+if __name__ == '__main__':
+    import argparse
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--json", help="Competition payload (World Rowing API, everything included)",
+                        default="../doc/examples/competition.json")
+    parser.add_argument("-r", "--repeat", help="Runs per mode (the fastest one is reported)", type=int, default=3)
+    args = parser.parse_args()
+
+    main(json_path=args.json, repeat=args.repeat)
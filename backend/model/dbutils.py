@@ -1,7 +1,9 @@
-from sqlalchemy import select
-from sqlalchemy.orm import joinedload
+from sqlalchemy import select, func
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.dialects import postgresql
 
-from contextlib import suppress
+from collections import defaultdict
+from contextlib import suppress, contextmanager
 import datetime as dt
 
 from common.helpers import Timedelta_Parser, parse_wr_intermediate_distance_key, get_, select_first
@@ -41,6 +43,85 @@ def query_by_uuid_(session, Entity_Class, uuid):
     return result_entity
 
 
+# key of session.info: identity map of batched_uuid_resolution()
+_IDENTITY_MAP_KEY = "wr_uuid_identity_map"
+
+# batched_uuid_resolution(): max. number of uuids per IN (...) query
+UUID_BATCH_SIZE = 1000
+
+# batched_uuid_resolution(): collections used by the wr_map_* functions are loaded along with the entities
+_PREFETCH_OPTIONS = {
+    model.Event: (selectinload(model.Event.races),),
+    model.Race: (selectinload(model.Race.race_boats),),
+    model.Race_Boat: (
+        selectinload(model.Race_Boat.athletes).joinedload(model.Association_Race_Boat_Athlete.athlete),
+        selectinload(model.Race_Boat.intermediates)
+    ),
+}
+
+
+def _collect_uuids(competition_data: dict) -> dict:
+    """Returns dict: Entity_Class -> set of uuids referenced by a competition payload (see wr_map_competition_scrape)"""
+    uuids = defaultdict(set)
+    def add(Entity_Class, data):
+        uuid = get_(data, 'id')
+        if uuid:
+            uuids[Entity_Class].add(uuid.lower())
+
+    competition_type = get_(competition_data, 'competitionType')
+    add(model.Competition_Type, competition_type)
+    add(model.Competition_Category, get_(competition_type, 'competitionCategory'))
+    venue = get_(competition_data, 'venue')
+    add(model.Venue, venue)
+    add(model.Country, get_(venue, 'country'))
+
+    for event in get_(competition_data, 'events', []):
+        add(model.Event, event)
+        add(model.Boat_Class, get_(event, 'boatClass'))
+        add(model.Gender, get_(event, 'gender'))
+        for race in get_(event, 'races', []):
+            add(model.Race, race)
+            for race_boat in get_(race, 'raceBoats', []):
+                add(model.Race_Boat, race_boat)
+                add(model.Country, get_(race_boat, 'country'))
+                for race_boat_athlete in get_(race_boat, 'raceBoatAthletes', []):
+                    add(model.Athlete, get_(race_boat_athlete, 'person'))
+    return uuids
+
+
+def _prefetch_by_uuid(session, uuids: dict) -> dict:
+    """Returns identity map: (Entity_Class, uuid) -> entity or None (not in db) for all given uuids"""
+    identity_map = {}
+    for Entity_Class, uuids_ in uuids.items():
+        uuids_ = sorted(uuids_)
+        for start in range(0, len(uuids_), UUID_BATCH_SIZE):
+            batch = uuids_[start:start+UUID_BATCH_SIZE]
+            identity_map.update(((Entity_Class, uuid), None) for uuid in batch)
+            statement = (
+                select(Entity_Class)
+                .where(Entity_Class.additional_id_.in_(batch))
+                .options(*_PREFETCH_OPTIONS.get(Entity_Class, ()))
+            )
+            for entity in session.scalars(statement):
+                identity_map[(Entity_Class, entity.additional_id_)] = entity
+    return identity_map
+
+
+@contextmanager
+def batched_uuid_resolution(session, competition_data: dict):
+    """Within this context, wr_insert() resolves the uuids of the competition payload from an identity map that is
+    filled with one IN (...) query per entity class (instead of one query per wr_insert() call).
+    Usage:
+        with batched_uuid_resolution(session, data):
+            wr_map_competition_scrape(session, competition, data)
+    """
+    session.info[_IDENTITY_MAP_KEY] = _prefetch_by_uuid(session, _collect_uuids(competition_data))
+    try:
+        yield
+    finally:
+        session.info.pop(_IDENTITY_MAP_KEY, None)
+
+
 def wr_insert(session, Entity_Class, map_func, data, overwrite_existing=True, add_session=True, **kwargs):
     """Proxy function to fetch or create an entity.
     Usage: wr_insert(session, model.Country, wr_map_country, data_dict)"""
@@ -48,12 +129,19 @@ def wr_insert(session, Entity_Class, map_func, data, overwrite_existing=True, ad
         return None
 
     uuid = data.get('id','').lower()
-    entity = query_by_uuid_(session, Entity_Class, uuid)
+    identity_map = session.info.get(_IDENTITY_MAP_KEY)
+    if identity_map != None and (Entity_Class, uuid) in identity_map:
+        entity = identity_map[(Entity_Class, uuid)]
+    else:
+        entity = query_by_uuid_(session, Entity_Class, uuid)
     create_entity = entity == None
 
     if create_entity:
         entity = Entity_Class()
         entity.additional_id_ = uuid
+        if identity_map != None:
+            # the same athlete/country/... may occur several times in a payload
+            identity_map[(Entity_Class, uuid)] = entity
 
     if create_entity or overwrite_existing:
         entity = map_func(session, entity, data, **kwargs)
@@ -347,6 +435,298 @@ def wr_map_competition_scrape(session, entity: model.Competition, data: dict):
     return entity
 
 
+#----------------------------------------------------------------------
+# Bulk upsert engine
+#
+# Alternative to wr_insert(session, model.Competition, wr_map_competition_scrape, data): the payload is flattened into
+# one row list per table, written with INSERT ... ON CONFLICT DO UPDATE (multi-row VALUES, chunked). Foreign keys are
+# resolved via RETURNING (additional_id_, id) of the parent tables. Writes the same rows as the ORM mappers except:
+#  - a zero duration intermediate never overwrites an existing intermediate
+#  - ORM instances already loaded in the session are not refreshed (use session.expire_all())
+
+BULK_UPSERT_CHUNK_SIZE = 1000
+
+
+def _bulk_upsert(session, Entity_Class, rows: list, index_elements=('additional_id_',), keep_existing=(),
+                 insert_only=(), returning=True) -> dict:
+    """INSERT ... ON CONFLICT (index_elements) DO UPDATE of rows (dicts with identical keys).
+    Columns in keep_existing keep their value if the new value is NULL, columns in insert_only are not updated.
+    Returns dict: additional_id_ -> id (if returning)"""
+    table = Entity_Class.__table__
+    ids = {}
+    for start in range(0, len(rows), BULK_UPSERT_CHUNK_SIZE):
+        chunk = rows[start:start+BULK_UPSERT_CHUNK_SIZE]
+        statement = postgresql.insert(table).values(chunk)
+        set_ = {
+            column: statement.excluded[column] for column in chunk[0].keys()
+            if not column in index_elements and not column in insert_only
+        }
+        for column in keep_existing:
+            set_[column] = func.coalesce(statement.excluded[column], table.c[column])
+
+        if set_:
+            statement = statement.on_conflict_do_update(index_elements=index_elements, set_=set_)
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=index_elements)
+        if returning:
+            statement = statement.returning(table.c.additional_id_, table.c.id)
+
+        result = session.execute(statement)
+        if returning:
+            ids.update(result.all())
+    return ids
+
+
+def _uuid(data) -> str:
+    uuid = get_(data, 'id')
+    return uuid.lower() if uuid else None
+
+
+def _iso_datetime(value):
+    """Returns datetime or None (keep existing value, see keep_existing)"""
+    with suppress(TypeError, ValueError):
+        return dt.datetime.fromisoformat(value or '')
+    return None
+
+
+def _millis(value):
+    with suppress(TypeError, ValueError):
+        return Timedelta_Parser.to_millis(value)
+    return None
+
+
+def _country_row(data) -> dict:
+    return {
+        'additional_id_': _uuid(data),
+        'country_code': get_(data, 'CountryCode'),
+        'name': get_(data, 'DisplayName'),
+        'is_former_country__': repr(get_(data, 'IsFormerCountry')),
+        'is_noc__': repr(get_(data, 'IsNOC')),
+    }
+
+
+def _athlete_row(data) -> dict:
+    birthdate = _iso_datetime(get_(data, 'BirthDate', ''))
+    return {
+        'additional_id_': _uuid(data),
+        'name': get_(data, 'DisplayName'),
+        'first_name__': get_(data, 'FirstName'),
+        'last_name__': get_(data, 'LastName'),
+        'birthdate': birthdate.date() if birthdate else None,
+        'height_cm__': get_(data, 'HeightCm'),
+        'weight_kg__': get_(data, 'WeightKg'),
+    }
+
+
+def _race_row(data) -> dict:
+    name = get_(data, 'DisplayName')
+    phase_type = get_( get_(data, 'racePhase', {}), 'DisplayName' )
+    rsc_code = get_(data, 'RscCode')
+
+    phase_details = api.extract_race_phase_details(rsc_code=rsc_code, display_name=name)
+    subtype = get_(phase_details, 'subtype')
+
+    return {
+        'additional_id_': _uuid(data),
+        'name': name,
+        'date': _iso_datetime(get_(data, 'Date', '')),
+        'phase_type': phase_type.lower() if phase_type else None,
+        'phase_subtype': subtype.upper() if subtype else None,
+        'phase_number': get_(phase_details, 'number'),
+        'progression': get_(data, 'Progression'),
+        'rsc_code': rsc_code,
+        'pdf_url_results': get_(api.select_pdf_(get_(data, 'pdfUrls', []), 'results'), 'url'),
+        'pdf_url_race_data': get_(api.select_pdf_(get_(data, 'pdfUrls', []), 'race data'), 'url'),
+        'race_status__': str( get_( get_(data, 'raceStatus', {} ), 'DisplayName' ) ).strip().lower(),
+        'race_nr__': str( get_(data, 'RaceNr') ),
+        'rescheduled__': repr( get_(data, 'Rescheduled') ),
+        'rescheduled_from__': repr( get_(data, 'RescheduledFrom') ),
+    }
+
+
+def _race_boat_row(data) -> dict:
+    invalid_mark_result_code = get_(get_(data, 'invalidMarkResultCode'), 'displayName', '').upper()
+    return {
+        'additional_id_': _uuid(data),
+        'name': get_(data, 'DisplayName'),
+        'result_time_ms': _millis(get_(data, 'ResultTime')),
+        'invalid_mark_result_code_id': invalid_mark_result_code or None,
+        'lane': get_(data, 'Lane'),
+        'rank': get_(data, 'Rank'),
+        'remark__': repr( get_(data, 'Remark') ),
+        'world_cup_points__': get_(data, 'WorldCupPoints'),
+        'club_name__': get_( get_(data, 'boat', {}), 'clubName' ),
+    }
+
+
+def _intermediate_rows(race_boat_data) -> list:
+    """Returns rows of distinct distances (see wr_map_race_boat regarding duplicates)"""
+    rows = {}
+    for interm_data in reversed(get_(race_boat_data, 'raceBoatIntermediates', [])):
+        try:
+            distance_key = get_(get_(interm_data, 'distance'), 'DisplayName', '')
+            distance_meter = parse_wr_intermediate_distance_key(distance_key)
+            row = {
+                'distance_meter': distance_meter,
+                'data_source': model.Enum_Data_Source.world_rowing_api.value,
+                'rank': get_(interm_data, 'Rank'),
+                'result_time_ms': Timedelta_Parser.to_millis( get_(interm_data, 'ResultTime') ),
+                'start_position__': repr( get_(interm_data, 'StartPosition') ),
+            }
+        except (TypeError, ValueError) as e:
+            logger.error(f'Intermediate_Time could not be parsed/converted/written')
+            logger.error(str(e))
+            continue
+
+        if row['result_time_ms'] == 0 and not distance_meter in rows:
+            continue # 0 durations appeared in the API Data and showed up in the db queries for best times
+        rows[distance_meter] = row
+    return list(rows.values())
+
+
+def wr_bulk_upsert_competition(session, data: dict) -> int:
+    """Writes a competition payload (World Rowing API, everything included) with the bulk upsert engine.
+    Returns id of the competition. Does not commit."""
+    # flatten: uuid -> row (later occurrences overwrite earlier ones like in the ORM mappers)
+    categories, competition_types, countries, venues = {}, {}, {}, {}
+    boat_classes, genders, athletes = {}, {}, {}
+    invalid_mark_result_codes = {}
+    events, races, race_boats = {}, {}, {}
+    associations, intermediates = {}, {}
+
+    competition_type = get_(data, 'competitionType')
+    competition_category = get_(competition_type, 'competitionCategory')
+    if competition_category:
+        categories[_uuid(competition_category)] = {
+            'additional_id_': _uuid(competition_category), 'name': get_(competition_category, 'DisplayName')
+        }
+    if competition_type:
+        competition_types[_uuid(competition_type)] = {
+            'additional_id_': _uuid(competition_type),
+            'name': get_(competition_type, 'DisplayName'),
+            'abbreviation': get_(competition_type, 'Abbreviation'),
+            'competition_category_id': _uuid(competition_category),
+        }
+    venue = get_(data, 'venue')
+    if venue:
+        venue_country = get_(venue, 'country')
+        if venue_country:
+            countries[_uuid(venue_country)] = _country_row(venue_country)
+        venues[_uuid(venue)] = {
+            'additional_id_': _uuid(venue),
+            'country_id': _uuid(venue_country),
+            'city': get_(venue, 'RegionCity'),
+            'site': get_(venue, 'Site'),
+            'is_world_rowing_venue': get_(venue, 'IsWorldRowingVenue'),
+        }
+
+    for event_data in get_(data, 'events', []):
+        boat_class, gender = get_(event_data, 'boatClass'), get_(event_data, 'gender')
+        if boat_class:
+            boat_classes[_uuid(boat_class)] = {
+                'additional_id_': _uuid(boat_class), 'abbreviation': get_(boat_class, 'DisplayName')
+            }
+        if gender:
+            genders[_uuid(gender)] = {'additional_id_': _uuid(gender), 'name': get_(gender, 'DisplayName')}
+        events[_uuid(event_data)] = {
+            'additional_id_': _uuid(event_data),
+            'name': get_(event_data, 'DisplayName'),
+            'boat_class_id': _uuid(boat_class),
+            'gender_id': _uuid(gender),
+            'rsc_code__': get_(event_data, 'RscCode'),
+        }
+
+        for race_data in get_(event_data, 'races', []):
+            races[_uuid(race_data)] = {**_race_row(race_data), 'event_id': _uuid(event_data)}
+
+            for race_boat_data in get_(race_data, 'raceBoats', []):
+                race_boat_uuid = _uuid(race_boat_data)
+                country = get_(race_boat_data, 'country')
+                if country:
+                    countries[_uuid(country)] = _country_row(country)
+
+                invalid_mark_result_code = get_(race_boat_data, 'invalidMarkResultCode')
+                abbreviation = get_(invalid_mark_result_code, 'displayName', '').upper()
+                if abbreviation:
+                    invalid_mark_result_codes[abbreviation] = {
+                        'id': abbreviation, 'name': get_(invalid_mark_result_code, 'code')
+                    }
+
+                race_boats[race_boat_uuid] = {
+                    **_race_boat_row(race_boat_data), 'race_id': _uuid(race_data), 'country_id': _uuid(country)
+                }
+
+                for race_boat_athlete in get_(race_boat_data, 'raceBoatAthletes', []):
+                    athlete_data = get_(race_boat_athlete, 'person', {})
+                    if athlete_data:
+                        athletes[_uuid(athlete_data)] = _athlete_row(athlete_data)
+                        associations[(race_boat_uuid, _uuid(athlete_data))] = {
+                            'race_boat_id': race_boat_uuid,
+                            'athlete_id': _uuid(athlete_data),
+                            'boat_position': get_(race_boat_athlete, 'boatPosition'),
+                        }
+
+                for row in _intermediate_rows(race_boat_data):
+                    intermediates[(race_boat_uuid, row['distance_meter'])] = {**row, 'race_boat_id': race_boat_uuid}
+
+    def resolve(rows: dict, column: str, ids: dict) -> list:
+        """Replaces the uuid in column by the id of the referenced entity"""
+        rows = list(rows.values()) if isinstance(rows, dict) else rows
+        for row in rows:
+            row[column] = ids.get(row[column])
+        return rows
+
+    # write: parents first
+    category_ids = _bulk_upsert(session, model.Competition_Category, list(categories.values()))
+    competition_type_ids = _bulk_upsert(session, model.Competition_Type,
+                                        resolve(competition_types, 'competition_category_id', category_ids))
+    country_ids = _bulk_upsert(session, model.Country, list(countries.values()))
+    venue_ids = _bulk_upsert(session, model.Venue, resolve(venues, 'country_id', country_ids))
+    boat_class_ids = _bulk_upsert(session, model.Boat_Class, list(boat_classes.values()))
+    gender_ids = _bulk_upsert(session, model.Gender, list(genders.values()))
+    athlete_ids = _bulk_upsert(session, model.Athlete, list(athletes.values()), keep_existing=('birthdate',))
+    _bulk_upsert(session, model.Invalid_Mark_Result_Code, list(invalid_mark_result_codes.values()),
+                 index_elements=('id',), insert_only=('name',), returning=False)
+
+    competition_uuid = _uuid(data)
+    year = None
+    with suppress(TypeError, ValueError):
+        year = int(get_(data, 'Year'))
+    competition_row = {
+        'additional_id_': competition_uuid,
+        'scraper_maintenance_level': model.Enum_Maintenance_Level.world_rowing_api_prescraped.value,
+        'scraper_data_provider': model.Enum_Data_Provider.world_rowing.value,
+        'competition_type_id': competition_type_ids.get(_uuid(competition_type)),
+        'venue_id': venue_ids.get(_uuid(venue)),
+        'name': get_(data, 'DisplayName'),
+        'year': year,
+        'start_date': _iso_datetime(get_(data, 'StartDate', '')),
+        'end_date': _iso_datetime(get_(data, 'EndDate', '')),
+        'is_fisa': get_(data, 'IsFisa'),
+        'competition_code__': get_(data, 'CompetitionCode'),
+    }
+    competition_ids = _bulk_upsert(session, model.Competition, [competition_row],
+                                   keep_existing=('year', 'start_date', 'end_date'),
+                                   insert_only=('scraper_maintenance_level',))
+    competition_id = competition_ids[competition_uuid]
+
+    for row in events.values():
+        row['competition_id'] = competition_id
+    resolve(events, 'boat_class_id', boat_class_ids)
+    event_ids = _bulk_upsert(session, model.Event, resolve(events, 'gender_id', gender_ids))
+    race_ids = _bulk_upsert(session, model.Race, resolve(races, 'event_id', event_ids), keep_existing=('date',))
+    resolve(race_boats, 'race_id', race_ids)
+    race_boat_ids = _bulk_upsert(session, model.Race_Boat, resolve(race_boats, 'country_id', country_ids),
+                                 keep_existing=('result_time_ms',))
+
+    resolve(associations, 'race_boat_id', race_boat_ids)
+    _bulk_upsert(session, model.Association_Race_Boat_Athlete, resolve(associations, 'athlete_id', athlete_ids),
+                 index_elements=('race_boat_id', 'athlete_id'), returning=False)
+    _bulk_upsert(session, model.Intermediate_Time, resolve(intermediates, 'race_boat_id', race_boat_ids),
+                 index_elements=('race_boat_id', 'distance_meter'), returning=False)
+    return competition_id
+
+
 if __name__ == '__main__':
     # Command line interface (CLI)
     import argparse
@@ -354,6 +734,8 @@ if __name__ == '__main__':
     parser.add_argument("-c", "--create", help="Create tables if not yet existing", action="store_true")
     parser.add_argument("-d", "--drop", help="Drop all tables described by the schema defined in model.py", action="store_true")
     parser.add_argument("-i", "--insert", help="Import JSON data for a rowing competition")
+    parser.add_argument("-e", "--engine", help="Ingestion engine for --insert: ORM mappers or bulk upserts",
+                        choices=("orm", "bulk"), default="orm")
     args = parser.parse_args()
     print(args)
 
@@ -375,6 +757,9 @@ if __name__ == '__main__':
         with Scoped_Session() as session:
             with open(args.insert, mode="r", encoding="utf-8") as fp:
                 competition_data = json.load(fp)
-            competition = wr_insert(session, model.Competition, wr_map_competition_scrape, competition_data)
+            if args.engine == "bulk":
+                wr_bulk_upsert_competition(session, competition_data)
+            else:
+                competition = wr_insert(session, model.Competition, wr_map_competition_scrape, competition_data)
             session.commit()
     
@@ -6,7 +6,7 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, scoped_session
 
 from sqlalchemy.orm import declarative_base, relationship
-from sqlalchemy import Column, ForeignKey, Integer, BigInteger, Float, String, Boolean, Date, DateTime, Enum
+from sqlalchemy import Column, ForeignKey, Integer, BigInteger, Float, String, Boolean, Date, DateTime, Enum, JSON
 
 import logging
 # logging.getLogger().setLevel(logging.INFO)
@@ -221,7 +221,7 @@ class Competition(Base):
 
     # holds info about the state of postprocessing using Enum_Maintenance_Level
     scraper_maintenance_level = Column(Integer, nullable=False)
-    scraper_last_scrape = Column(DateTime)
+    scraper_last_scrape = Column(DateTime) # last time data was written by the scraper (not advanced if unchanged)
     scraper_data_provider = Column(Integer) # Use Enum_Data_Provider
 
     competition_type_id = Column(ForeignKey("competition_types.id", name="fk_competition_comp_type"))
@@ -398,6 +398,26 @@ class Intermediate_Time(Base):
     start_position__ = Column(String)
 
 
+class Scraper_Checkpoint(Base):
+    """Bookkeeping of the scraper procedures, e.g. when postprocessing was completed the last time"""
+    __tablename__ = "scraper_checkpoints"
+
+    name = Column(String, primary_key=True)
+    timestamp = Column(DateTime, nullable=False)
+
+
+class Scraper_Competition_Digest(Base):
+    """Digests of the World Rowing API payload a competition was scraped from last time.
+    See scraper_procedures/change_detection.py"""
+    __tablename__ = "scraper_competition_digests"
+
+    competition_id = Column(ForeignKey("competitions.id", name="fk_comp_digest_competition", ondelete="CASCADE"),
+                            primary_key=True)
+    digest = Column(String, nullable=False) # competition and events without their races
+    race_digests = Column(JSON, nullable=False) # race uuid -> {"payload": digest, "pdf": digest}
+    timestamp = Column(DateTime, nullable=False) # last time the payload was checked (stored or found unchanged)
+
+
 #----------------------------------------------------------------------
 
 
@@ -0,0 +1,93 @@
+"""
+World best times (WBT) of all boat classes, loaded with a single query and cached in-process.
+
+The scraper (scraper_procedures/postprocessing.py) writes WBTs in refresh_world_best_times() and calls
+invalidate() afterwards, which only affects the scraper's own process. Other processes (e.g. the API server) keep
+serving the WBTs loaded before, i.e. they can be stale for up to WBT_CACHE_TTL_SECONDS after
+refresh_world_best_times().
+"""
+import os
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+from sqlalchemy import select
+
+from . import model
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+WBT_CACHE_TTL_SECONDS = float(os.environ.get('WBT_CACHE_TTL_SECONDS', '300').strip())
+
+World_Best_Time = namedtuple(
+    "World_Best_Time",
+    ["boat_class_id", "boat_class_uuid", "boat_class", "race_boat_id", "result_time_ms", "date"]
+)
+
+# (expiry timestamp, lookup by abbreviation, lookup by uuid)
+_cache = (0., MappingProxyType({}), MappingProxyType({}))
+
+
+def _load(session) -> tuple:
+    statement = (
+        select(
+            model.Boat_Class.id,
+            model.Boat_Class.additional_id_,
+            model.Boat_Class.abbreviation,
+            model.Race_Boat.id,
+            model.Race_Boat.result_time_ms,
+            model.Race.date
+        )
+        .outerjoin(model.Boat_Class.world_best_race_boat)
+        .outerjoin(model.Race_Boat.race)
+    )
+    by_abbreviation, by_uuid = {}, {}
+    for row in session.execute(statement):
+        wbt = World_Best_Time(*row)
+        by_abbreviation[wbt.boat_class] = wbt
+        by_uuid[wbt.boat_class_uuid] = wbt
+    return MappingProxyType(by_abbreviation), MappingProxyType(by_uuid)
+
+
+def invalidate():
+    """Drop the cached WBTs. The next lookup reloads them from the database."""
+    global _cache
+    _cache = (0., MappingProxyType({}), MappingProxyType({}))
+    logger.debug("World best time cache invalidated")
+
+
+def _lookups(session) -> tuple:
+    global _cache
+    expiry, by_abbreviation, by_uuid = _cache
+    now = time.monotonic()
+    if now >= expiry:
+        by_abbreviation, by_uuid = _load(session)
+        _cache = (now + WBT_CACHE_TTL_SECONDS, by_abbreviation, by_uuid)
+        logger.debug(f"World best time cache loaded: {len(by_abbreviation)} boat classes, ttl={WBT_CACHE_TTL_SECONDS}s")
+    return by_abbreviation, by_uuid
+
+
+def get_all(session) -> MappingProxyType:
+    """Returns a read-only dict: boat class abbreviation -> World_Best_Time (for ALL boat classes;
+    race_boat_id, result_time_ms and date are None if no WBT is known)"""
+    return _lookups(session)[0]
+
+
+def get_by_uuid(session, boat_class_uuid: str):
+    """Returns World_Best_Time of the boat class (World Rowing uuid) or None if the boat class is unknown"""
+    return _lookups(session)[1].get(boat_class_uuid)
+
+
+def get(session, boat_class: str):
+    """Returns World_Best_Time of the boat class (abbreviation e.g. "M1x") or None if the boat class is unknown"""
+    return get_all(session).get(boat_class)
+
+
+def result_time_ms(session, boat_class: str, default=0):
+    """Returns world best time in ms of the boat class (abbreviation) or default if no WBT is known"""
+    wbt = get(session, boat_class)
+    if wbt == None or wbt.race_boat_id == None:
+        return default
+    return wbt.result_time_ms
@@ -9,6 +9,7 @@ from scraper_procedures.config import *
 from scraper_procedures.prescraping import prescrape
 from scraper_procedures.scraping import scrape
 from scraper_procedures.postprocessing import postprocess
+from scraping_wr import recorder
 
 """ Architectural Notes:
 - [PRESCRAPE] Procedure
@@ -61,13 +62,23 @@ if __name__ == '__main__':
         choices=list(procedures.keys()), action="append"
     )
     parser.add_argument("-s", "--singlepass", help="Ignore the scheduler. Script exits after one pass.", action="store_true")
+    fixtures = parser.add_mutually_exclusive_group()
+    fixtures.add_argument("--record", help="Record all API responses and PDFs to this directory (implies --singlepass)",
+                          metavar="DIR")
+    fixtures.add_argument("--replay", help="Replay API responses and PDFs from this directory instead of requesting "
+                          "them (implies --singlepass)", metavar="DIR")
     args = parser.parse_args()
     logger.info(args)
 
-    
+    singlepass = args.singlepass
+    if args.record or args.replay:
+        recorder.configure("record" if args.record else "replay", args.record or args.replay)
+        singlepass = True
+
     if not args.procedure:
-        start_service(singlepass=args.singlepass)
+        start_service(singlepass=singlepass)
     else:
         for procedure_id in args.procedure:
             function = procedures[procedure_id]
             function()
+    recorder.log_stats(logger=logger)
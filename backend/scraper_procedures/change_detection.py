@@ -0,0 +1,135 @@
+"""
+Change detection for rescraping competitions (see scraping._scrape_competition).
+
+The payload of a competition (World Rowing API, everything included) is summarized by digests that are stored in
+model.Scraper_Competition_Digest after a successful scrape:
+* one digest of the competition and its events without their races
+* per race: a digest of the whole race payload and a digest of what the PDF injection depends on (PDF urls and
+  boat names/ranks/results)
+
+On rescrape, only races whose payload changed are remapped (dbutils.wr_map_* only adds/updates, so unchanged races can
+be left out of the payload). Remapping a race overwrites intermediates injected from the results PDF, so its results
+PDF is injected again; the race data PDF only if its digest changed. If nothing changed, the competition is skipped.
+
+Timestamps: Competition.scraper_last_scrape is the last time data of the competition was written, i.e. it is not
+advanced for skipped competitions (e.g. incremental postprocessing relies on that). Scraper_Competition_Digest.timestamp
+is the last time the payload was checked (stored or found unchanged, see mark_checked).
+"""
+import json
+import hashlib
+import datetime
+from collections import namedtuple
+
+from .config import SCRAPER_CHANGE_DETECTION
+from model import model
+from common.helpers import get_
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# Bump whenever the mapping (dbutils.wr_map_*) or the PDF injection changes: every competition is remapped once
+DIGEST_VERSION = 1
+
+Changes = namedtuple("Changes", [
+    "digest",            # digest of competition & events without races
+    "race_digests",      # race uuid -> {"payload": digest, "pdf": digest}
+    "shell_changed",     # competition or event fields changed
+    "remap_races",       # set of race uuids: payload changed -> remap & inject results PDF
+    "race_data_races",   # set of race uuids: PDF relevant data changed -> inject race data PDF
+])
+
+
+def _digest(data) -> str:
+    serialized = json.dumps([DIGEST_VERSION, data], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(serialized.encode()).hexdigest()
+
+
+def _race_uuid(race_data: dict) -> str:
+    return get_(race_data, 'id', '').lower()
+
+
+def _pdf_relevant_data(race_data: dict) -> dict:
+    boats = [
+        (get_(boat, 'DisplayName'), get_(boat, 'Rank'), get_(boat, 'ResultTime'))
+        for boat in get_(race_data, 'raceBoats', [])
+    ]
+    return {"pdfUrls": get_(race_data, 'pdfUrls', []), "raceBoats": boats}
+
+
+def _compute(competition_data: dict) -> tuple:
+    """Returns tuple (digest, race_digests)"""
+    events, race_digests = [], {}
+    for event_data in get_(competition_data, 'events', []):
+        races = get_(event_data, 'races', [])
+        events.append({**event_data, 'races': [_race_uuid(race_data) for race_data in races]})
+        for race_data in races:
+            race_digests[_race_uuid(race_data)] = {
+                "payload": _digest(race_data),
+                "pdf": _digest(_pdf_relevant_data(race_data))
+            }
+    digest = _digest({**competition_data, 'events': events})
+    return digest, race_digests
+
+
+def detect(session, competition: model.Competition, competition_data: dict) -> Changes:
+    """Compares the payload with the digests stored by the last scrape of the competition"""
+    digest, race_digests = _compute(competition_data)
+
+    stored = None
+    if SCRAPER_CHANGE_DETECTION and competition.id != None:
+        stored = session.get(model.Scraper_Competition_Digest, competition.id)
+    if stored == None:
+        return Changes(digest, race_digests, True, set(race_digests), set(race_digests))
+
+    stored_races = stored.race_digests or {}
+    remap_races, race_data_races = set(), set()
+    for uuid, race_digest in race_digests.items():
+        stored_race = stored_races.get(uuid, {})
+        if stored_race.get("payload") != race_digest["payload"]:
+            remap_races.add(uuid)
+        if stored_race.get("pdf") != race_digest["pdf"]:
+            race_data_races.add(uuid)
+
+    return Changes(digest, race_digests, stored.digest != digest, remap_races, race_data_races)
+
+
+def is_unchanged(changes: Changes) -> bool:
+    return not (changes.shell_changed or changes.remap_races or changes.race_data_races)
+
+
+def mark_checked(session, competition: model.Competition):
+    """Records that the payload of the competition was found unchanged (does not commit)"""
+    stored = session.get(model.Scraper_Competition_Digest, competition.id)
+    if stored != None:
+        stored.timestamp = datetime.datetime.now()
+
+
+def prune(competition_data: dict, changes: Changes) -> dict:
+    """Returns a copy of the payload that only contains the races to remap (and their events; all events if the
+    competition or an event changed)"""
+    events = []
+    for event_data in get_(competition_data, 'events', []):
+        races = [race_data for race_data in get_(event_data, 'races', [])
+                 if _race_uuid(race_data) in changes.remap_races]
+        if races or changes.shell_changed:
+            events.append({**event_data, 'races': races})
+    return {**competition_data, 'events': events}
+
+
+def store(session, competition: model.Competition, changes: Changes, failed_results=(), failed_race_data=()):
+    """Stores the digests of the scraped payload (does not commit). Races whose PDFs failed to be fetched/parsed are
+    stored without the respective digest, i.e. they are processed again by the next scrape."""
+    race_digests = {}
+    for uuid, race_digest in changes.race_digests.items():
+        race_digests[uuid] = {
+            "payload": None if uuid in failed_results else race_digest["payload"],
+            "pdf": None if uuid in failed_race_data else race_digest["pdf"]
+        }
+
+    session.merge(model.Scraper_Competition_Digest(
+        competition_id=competition.id,
+        digest=changes.digest,
+        race_digests=race_digests,
+        timestamp=datetime.datetime.now()
+    ))
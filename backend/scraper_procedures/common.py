@@ -21,6 +21,7 @@ def bubble_up_2km_intermediate(intermediate: model.Intermediate_Time):
 
 def bubble_down_2km_intermediate(session, race_boat: model.Race_Boat, force_overwrite=True, outlier_val=True, logger=logger, data_source=None):
     """ synchronizes Race_Boat result data to its 2km Intermediate
+        outlier_val=None keeps is_outlier of an existing intermediate
     """
     written_something_ = False
 
@@ -34,7 +35,8 @@ def bubble_down_2km_intermediate(session, race_boat: model.Race_Boat, force_over
         intermediate.invalid_mark_result_code_id = race_boat.invalid_mark_result_code_id
         intermediate.rank = race_boat.rank
         intermediate.result_time_ms = race_boat.result_time_ms
-        intermediate.is_outlier = outlier_val
+        if outlier_val != None:
+            intermediate.is_outlier = outlier_val
         if data_source != None:
             intermediate.data_source = data_source
 
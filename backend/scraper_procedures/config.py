@@ -22,4 +22,19 @@ SCRAPER_DEV_MODE = os.environ.get('DRV_SCRAPER_DEV_MODE','').strip() == '1'
 SCRAPER_RESCRAPE_LIMIT_DAYS = int(os.environ.get('SCRAPER_RESCRAPE_LIMIT_DAYS', '45').strip())
 
 # Assumption on how long a competition takes
-SCRAPER_MAINTENANCE_PERIOD_DAYS = int(os.environ.get('SCRAPER_MAINTENANCE_PERIOD_DAYS', '7').strip())
\ No newline at end of file
+SCRAPER_MAINTENANCE_PERIOD_DAYS = int(os.environ.get('SCRAPER_MAINTENANCE_PERIOD_DAYS', '7').strip())
+
+# Number of competitions scraped in parallel (threads; each worker uses its own db session/connection)
+SCRAPER_WORKERS = max(1, int(os.environ.get('SCRAPER_WORKERS', '1').strip()))
+
+# Number of processes parsing PDFs (shared by all workers; 0 -> parse in the worker thread)
+SCRAPER_PDF_PARSER_PROCESSES = int(os.environ.get('SCRAPER_PDF_PARSER_PROCESSES', str(os.cpu_count() or 1)).strip())
+
+# Postprocess only competitions scraped since the last postprocessing (the first pass processes everything)
+SCRAPER_POSTPROCESS_INCREMENTAL = os.environ.get('SCRAPER_POSTPROCESS_INCREMENTAL','1').strip() == '1'
+
+# Rescrape only races whose World Rowing API payload changed since the last scrape (see change_detection.py)
+SCRAPER_CHANGE_DETECTION = os.environ.get('SCRAPER_CHANGE_DETECTION','1').strip() == '1'
+
+# Resolve the uuids of a competition payload with one query per entity class (see dbutils.batched_uuid_resolution)
+SCRAPER_BATCHED_UUID_RESOLUTION = os.environ.get('SCRAPER_BATCHED_UUID_RESOLUTION','1').strip() == '1'
@@ -12,6 +12,8 @@ import os
 
 OUTLIER_DETECTION_PERCENTILE_MIN = float(os.environ.get('OUTLIER_DETECTION_PERCENTILE_MIN','.001').strip())
 OUTLIER_DETECTION_PERCENTILE_MAX = float(os.environ.get('OUTLIER_DETECTION_PERCENTILE_MAX','.97').strip())
+# "bulk": one percentile query and one UPDATE per table and boat class; "rowwise": one UPDATE per outlier
+OUTLIER_DETECTION_MODE = os.environ.get('OUTLIER_DETECTION_MODE','bulk').strip().lower()
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("outlier_detector")
@@ -238,3 +240,142 @@ def outlier_detection_result_data(session:Session, boat_class: model.Boat_Class)
             session.commit()
 
     return None
+
+
+
+def _where_race_boat_of_boat_class(Entity_Class, boat_class_id):
+    """Join conditions Entity_Class -> ... -> Competition_Type for an UPDATE ... FROM"""
+    return (
+        Entity_Class.race_boat_id == model.Race_Boat.id,
+        model.Race_Boat.race_id == model.Race.id,
+        model.Race.event_id == model.Event.id,
+        model.Event.competition_id == model.Competition.id,
+        model.Competition.competition_type_id == model.Competition_Type.id,
+        model.Event.boat_class_id == boat_class_id
+    )
+
+
+def reset_outliers(session:Session, boat_class_id: int, competition_category_ids) -> None:
+    """Sets is_outlier=False for intermediates and race data of the boat class in the given competition categories"""
+    for Entity_Class in (model.Intermediate_Time, model.Race_Data):
+        updt = (
+            update(Entity_Class)
+            .where(
+                *_where_race_boat_of_boat_class(Entity_Class, boat_class_id),
+                model.Competition_Type.competition_category_id.in_(competition_category_ids)
+            )
+            .values(is_outlier=False)
+            .execution_options(synchronize_session=False)
+        )
+        session.execute(updt)
+
+
+def outlier_detection_race_data_bulk(session:Session, boat_class: model.Boat_Class, competition_category_ids=None) -> int:
+    """
+    Set-based version of outlier_detection_race_data(): percentiles of all (distance_meter, competition category)
+    groups are computed in one grouped subquery and outliers are marked with a single UPDATE ... FROM.
+    competition_category_ids optionally limits the groups. Does not commit. Returns the number of marked rows.
+    """
+    logger.info(f"Marking race_data (bulk) for boat class: {boat_class.id}")
+    percentiles_statement = (
+        select(
+            model.Race_Data.distance_meter,
+            model.Competition_Category.id.label("competition_category_id"),
+            func.percentile_cont(OUTLIER_DETECTION_PERCENTILE_MIN).within_group(model.Race_Data.speed_meter_per_sec.desc()).label("smps_a"),
+            func.percentile_cont(OUTLIER_DETECTION_PERCENTILE_MAX).within_group(model.Race_Data.speed_meter_per_sec.desc()).label("smps_b"),
+            func.percentile_cont(OUTLIER_DETECTION_PERCENTILE_MIN).within_group(model.Race_Data.stroke.desc()).label("stroke_a"),
+            func.percentile_cont(OUTLIER_DETECTION_PERCENTILE_MAX).within_group(model.Race_Data.stroke.desc()).label("stroke_b"),
+        )
+        .join(model.Race_Data.race_boat)
+        .join(model.Race_Boat.race)
+        .join(model.Race.event)
+        .join(model.Event.competition)
+        .join(model.Competition.competition_type)
+        .join(model.Competition_Type.competition_category)
+        .where(
+            model.Event.boat_class_id == boat_class.id,
+            model.Race_Data.speed_meter_per_sec != 0
+        )
+        .group_by(
+            model.Race_Data.distance_meter,
+            model.Competition_Category.id
+        )
+    )
+    if competition_category_ids != None:
+        percentiles_statement = percentiles_statement.where(model.Competition_Category.id.in_(competition_category_ids))
+    percentiles = percentiles_statement.subquery()
+
+    updt = (
+        update(model.Race_Data)
+        .where(
+            *_where_race_boat_of_boat_class(model.Race_Data, boat_class.id),
+            percentiles.c.distance_meter == model.Race_Data.distance_meter,
+            percentiles.c.competition_category_id == model.Competition_Type.competition_category_id,
+            # like the rowwise implementation: skip groups where a percentile is missing (NULL) or zero
+            percentiles.c.smps_a != 0, percentiles.c.smps_b != 0,
+            percentiles.c.stroke_a != 0, percentiles.c.stroke_b != 0,
+            or_(
+                ~model.Race_Data.speed_meter_per_sec.between(
+                    func.least(percentiles.c.smps_a, percentiles.c.smps_b),
+                    func.greatest(percentiles.c.smps_a, percentiles.c.smps_b)
+                ),
+                ~model.Race_Data.stroke.between(
+                    func.least(percentiles.c.stroke_a, percentiles.c.stroke_b),
+                    func.greatest(percentiles.c.stroke_a, percentiles.c.stroke_b)
+                ),
+            )
+        )
+        .values(is_outlier=True)
+        .execution_options(synchronize_session=False)
+    )
+    return session.execute(updt).rowcount
+
+
+def outlier_detection_result_data_bulk(session:Session, boat_class: model.Boat_Class, competition_category_ids=None) -> int:
+    """
+    Set-based version of outlier_detection_result_data(): percentiles of all (distance_meter, competition category)
+    groups are computed in one grouped subquery and outliers are marked with a single UPDATE ... FROM.
+    competition_category_ids optionally limits the groups. Does not commit. Returns the number of marked rows.
+    """
+    logger.info(f"Marking result_data (bulk) for boat class: {boat_class.id}")
+    percentiles_statement = (
+        select(
+            model.Intermediate_Time.distance_meter,
+            model.Competition_Category.id.label("competition_category_id"),
+            func.percentile_cont(OUTLIER_DETECTION_PERCENTILE_MIN).within_group(model.Intermediate_Time.result_time_ms.desc()).label("time_a"),
+            func.percentile_cont(OUTLIER_DETECTION_PERCENTILE_MAX).within_group(model.Intermediate_Time.result_time_ms.desc()).label("time_b"),
+        )
+        .join(model.Intermediate_Time.race_boat)
+        .join(model.Race_Boat.race)
+        .join(model.Race.event)
+        .join(model.Event.competition)
+        .join(model.Competition.competition_type)
+        .join(model.Competition_Type.competition_category)
+        .where(
+            model.Event.boat_class_id == boat_class.id,
+            model.Intermediate_Time.result_time_ms != 0
+        )
+        .group_by(
+            model.Intermediate_Time.distance_meter,
+            model.Competition_Category.id
+        )
+    )
+    if competition_category_ids != None:
+        percentiles_statement = percentiles_statement.where(model.Competition_Category.id.in_(competition_category_ids))
+    percentiles = percentiles_statement.subquery()
+
+    updt = (
+        update(model.Intermediate_Time)
+        .where(
+            *_where_race_boat_of_boat_class(model.Intermediate_Time, boat_class.id),
+            percentiles.c.distance_meter == model.Intermediate_Time.distance_meter,
+            percentiles.c.competition_category_id == model.Competition_Type.competition_category_id,
+            ~model.Intermediate_Time.result_time_ms.between(
+                func.least(percentiles.c.time_a, percentiles.c.time_b),
+                func.greatest(percentiles.c.time_a, percentiles.c.time_b)
+            )
+        )
+        .values(is_outlier=True)
+        .execution_options(synchronize_session=False)
+    )
+    return session.execute(updt).rowcount
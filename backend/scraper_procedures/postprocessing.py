@@ -1,21 +1,26 @@
 import logging
+import datetime
 from contextlib import suppress
-from itertools import count
 
-from sqlalchemy import select, update
+from sqlalchemy import select, update, literal
+from sqlalchemy.dialects import postgresql
 from sqlalchemy.sql.expression import func
 from sqlalchemy.orm import joinedload
 
+from .config import SCRAPER_POSTPROCESS_INCREMENTAL
 from .common import bubble_up_2km_intermediate, bubble_down_2km_intermediate
 from model import model
 from model import dbutils
+from model import world_best_times
 from scraping_wr import api
 from scraper_procedures import outlier_detection
-from common.helpers import Timedelta_Parser, get_, true_every_nth
+from common.helpers import Timedelta_Parser, get_
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("postprocessing")
 
+CHECKPOINT_POSTPROCESS = "postprocess"
+
 def _wr_select_boat_class(boat_classes_dict, search_str):
     result = None
     for boat_class_data in boat_classes_dict:
@@ -72,7 +77,7 @@ def refresh_world_best_times(session):
             race_boat=race_boat,
             data_source=model.Enum_Data_Source.world_rowing_api.value,
             force_overwrite=True,
-            outlier_val=False
+            outlier_val=None # keep; is_outlier is (re-)computed by mark_outliers()
         )
 
         boat_class.world_best_race_boat = race_boat
@@ -80,51 +85,131 @@ def refresh_world_best_times(session):
         logger.info(f"Updating wbt for boat_class: {boat_class_abbr}")
 
     session.commit()
+    world_best_times.invalidate()
 
 
-def mark_outliers(session):
-    # todo: add me to the actual postprocessing
-    with model.Scoped_Session() as session:
-        statement = select(model.Boat_Class).order_by(model.Boat_Class.id)
-        iterator = session.execute(statement).scalars()
-
-        # set all is_outlier to False to ensure that the percentile-strategy works
-        session.execute( update(model.Intermediate_Time).values(is_outlier=False) )
-        session.execute( update(model.Race_Data).values(is_outlier=False) )
+def _get_checkpoint(session, name):
+    checkpoint = session.get(model.Scraper_Checkpoint, name)
+    return checkpoint.timestamp if checkpoint else None
 
-        for boat_class in iterator:
-            outlier_detection.outlier_detection_result_data(session=session, boat_class=boat_class)
-            outlier_detection.outlier_detection_race_data(session=session, boat_class=boat_class)
+def _set_checkpoint(session, name, timestamp):
+    session.merge(model.Scraper_Checkpoint(name=name, timestamp=timestamp))
 
-            # Low Prio TODO: session.commit() should ideally be executed here
+def _competitions_scraped_since(session, since) -> list:
+    statement = select(model.Competition.id).where(model.Competition.scraper_last_scrape > since)
+    return session.execute(statement).scalars().all()
 
-def bubble_down_2km_intermediate_(session, force_overwrite=True, outlier_val=True):
+def _outlier_groups_of_competitions(session, competition_ids) -> dict:
+    """Returns dict: boat_class_id -> set of competition_category_ids that occur in the given competitions"""
     statement = (
-        select(model.Race_Boat)
-        # .options( joinedload(model.Race_Boat.intermediates) )
+        select(model.Event.boat_class_id, model.Competition_Type.competition_category_id)
+        .join(model.Event.competition)
+        .join(model.Competition.competition_type)
+        .where(
+            model.Competition.id.in_(competition_ids),
+            model.Event.boat_class_id != None,
+            model.Competition_Type.competition_category_id != None
+        )
+        .distinct()
     )
-    iterator = session.execute(statement).scalars()
-    entities_written = 0
-    for race_boat, n, print_log in zip(iterator, count(), true_every_nth(1500)):
-        written = bubble_down_2km_intermediate(session=session, race_boat=race_boat, force_overwrite=force_overwrite, outlier_val=outlier_val)
-        if written:
-            entities_written += 1
+    groups = {}
+    for boat_class_id, competition_category_id in session.execute(statement):
+        groups.setdefault(boat_class_id, set()).add(competition_category_id)
+    return groups
+
+def mark_outliers(session, mode=outlier_detection.OUTLIER_DETECTION_MODE, competition_ids=None):
+    """
+    Marks outliers of all boat classes.
+    If competition_ids is given, only the (boat class, competition category) groups these competitions belong to are
+    reset and recomputed ("bulk" mode only).
+    """
+    if mode == 'bulk':
+        detectors = (outlier_detection.outlier_detection_result_data_bulk, outlier_detection.outlier_detection_race_data_bulk)
+    elif mode == 'rowwise':
+        detectors = (outlier_detection.outlier_detection_result_data, outlier_detection.outlier_detection_race_data)
+    else:
+        raise ValueError(f'Unknown outlier detection mode "{mode}"; expected "bulk" or "rowwise"')
+
+    if competition_ids != None and mode != 'bulk':
+        logger.warning(f'Incremental outlier marking is not supported in mode "{mode}". Marking all boat classes')
+        competition_ids = None
 
-        if print_log:
-            logger.info(f'... visited so far: {n}')
+    with model.Scoped_Session() as session:
+        if competition_ids == None:
+            statement = select(model.Boat_Class).order_by(model.Boat_Class.id)
+            groups = {boat_class.id: None for boat_class in session.execute(statement).scalars()}
+
+            # set all is_outlier to False to ensure that the percentile-strategy works
+            session.execute( update(model.Intermediate_Time).values(is_outlier=False) )
+            session.execute( update(model.Race_Data).values(is_outlier=False) )
+        else:
+            groups = _outlier_groups_of_competitions(session, competition_ids)
+            logger.info(f"Incremental outlier marking: competitions={len(competition_ids)} boat_classes={len(groups)}")
+
+        for boat_class_id, competition_category_ids in sorted(groups.items()):
+            boat_class = session.get(model.Boat_Class, boat_class_id)
+            if competition_category_ids == None:
+                for detector in detectors:
+                    detector(session=session, boat_class=boat_class)
+            else:
+                outlier_detection.reset_outliers(session, boat_class_id, competition_category_ids)
+                for detector in detectors:
+                    detector(session=session, boat_class=boat_class, competition_category_ids=competition_category_ids)
+            session.commit()
+
+def bubble_down_2km_intermediate_(session, force_overwrite=True, outlier_val=True, competition_ids=None):
+    """Set-based version of common.bubble_down_2km_intermediate() for all race boats (optionally only those of the
+    given competitions): a single INSERT ... ON CONFLICT writes the 2km intermediates from race_boats"""
+    source = select(
+        model.Race_Boat.id,
+        literal(2000),
+        model.Race_Boat.invalid_mark_result_code_id,
+        model.Race_Boat.rank,
+        model.Race_Boat.result_time_ms,
+        literal(True if outlier_val == None else outlier_val)
+    )
+    if competition_ids != None:
+        source = (
+            source
+            .join(model.Race_Boat.race)
+            .join(model.Race.event)
+            .where(model.Event.competition_id.in_(competition_ids))
+        )
 
+    columns = ["race_boat_id", "distance_meter", "invalid_mark_result_code_id", "rank", "result_time_ms", "is_outlier"]
+    statement = postgresql.insert(model.Intermediate_Time).from_select(columns, source)
+    if force_overwrite:
+        update_columns = columns[2:] if outlier_val != None else columns[2:-1]
+        statement = statement.on_conflict_do_update(
+            index_elements=[model.Intermediate_Time.race_boat_id, model.Intermediate_Time.distance_meter],
+            set_={column: statement.excluded[column] for column in update_columns}
+        )
+    else:
+        statement = statement.on_conflict_do_nothing(
+            index_elements=[model.Intermediate_Time.race_boat_id, model.Intermediate_Time.distance_meter]
+        )
+
+    entities_written = session.execute(statement).rowcount
     session.commit()
     logger.info(f"Bubbled down count={entities_written}")
 
-def postprocess():
+def postprocess(incremental=SCRAPER_POSTPROCESS_INCREMENTAL):
     with model.Scoped_Session() as session:
+        started = datetime.datetime.now()
+        competition_ids = None # None -> everything
+        last_postprocess = _get_checkpoint(session, CHECKPOINT_POSTPROCESS) if incremental else None
+        if last_postprocess:
+            competition_ids = _competitions_scraped_since(session, last_postprocess)
+            logger.info(f"Incremental postprocessing of competitions scraped since {last_postprocess} N={len(competition_ids)}")
+
         logger.info(f"Bubble-down precedure (synchronize/create 2km intermediate)")
-        bubble_down_2km_intermediate_(session=session, force_overwrite=True, outlier_val=True)
+        bubble_down_2km_intermediate_(session=session, force_overwrite=True, outlier_val=True, competition_ids=competition_ids)
 
         logger.info(f"Fetch & write world best times. Also syncs to 2km intermediate")
         refresh_world_best_times(session=session)
 
         logger.info("Outlier Marking")
-        mark_outliers(session=session)
-        
+        mark_outliers(session=session, competition_ids=competition_ids)
+
+        _set_checkpoint(session, CHECKPOINT_POSTPROCESS, started)
         session.commit()
@@ -6,7 +6,7 @@ from sqlalchemy import select
 from .config import *
 from model import model
 from model import dbutils
-from scraping_wr import api
+from scraping_wr import api, http_client, json_cache
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -67,4 +67,7 @@ def prescrape(**kwargs):
     with model.Scoped_Session() as session:
         logger.info(f"Final decision for year range selection: {year_min}-{year_max}")
         _scrape_competition_heads(session=session, year_min=year_min, year_max=year_max, logger=logger)
-        session.commit()
\ No newline at end of file
+        session.commit()
+
+    http_client.log_connection_stats(logger=logger)
+    json_cache.log_stats(logger=logger)
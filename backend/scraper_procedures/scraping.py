@@ -1,6 +1,10 @@
 import logging
 import datetime
-from contextlib import suppress
+import time
+import threading
+from contextlib import suppress, nullcontext
+import multiprocessing
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor, as_completed
 
 tqdm = lambda x: x
 # from tqdm import tqdm
@@ -8,12 +12,14 @@ tqdm = lambda x: x
 from sqlalchemy import select
 from sqlalchemy import func, desc, and_, or_, not_
 from sqlalchemy.orm import joinedload
+from sqlalchemy.exc import IntegrityError
 
 from .config import *
 from .common import bubble_up_2km_intermediate
+from . import change_detection
 from model import model
 from model import dbutils
-from scraping_wr import api, pdf_race_data, pdf_result
+from scraping_wr import api, http_client, json_cache, pdf_cache, pdf_race_data, pdf_result
 from common import rowing
 from common.helpers import get_, select_first, Timedelta_Parser
 
@@ -22,6 +28,14 @@ logger = logging.getLogger("scrape")
 
 REQUIRED_INTERMEDIATES_MARKS = ( 500, 1000, 1500, 2000 )
 
+# Workers of scrape() share entities like athletes or countries (upserted by uuid). Writing those concurrently results in
+# conflicting INSERTs, so the JSON -> db mapping is done one worker at a time. Fetching and PDF parsing run in parallel.
+_mapping_lock = threading.Lock()
+
+# see _get_pdf_parser_pool()
+_pdf_parser_pool = None
+_pdf_parser_pool_lock = threading.Lock()
+
 def _get_competitions_to_scrape(session):
     """Returns tuple: competitions_iterator, number_of_competitions"""
     LEVEL_PRESCRAPED = model.Enum_Maintenance_Level.world_rowing_api_prescraped.value
@@ -83,6 +97,11 @@ def _parse_and_inject_pdf_race_data(session, race: model.Race):
     url = race.pdf_url_race_data
     logger.info(f'pdf_racedata:Fetch & parse PDF race data url="{url}"')
     pdf_race_data_, _ = pdf_race_data.extract_data_from_pdf_url([url])
+    _inject_pdf_race_data(session=session, race=race, pdf_race_data_=pdf_race_data_)
+
+
+def _inject_pdf_race_data(session, race: model.Race, pdf_race_data_: dict):
+    """Merge stage: writes parsed race data (see pdf_race_data.extract_data_from_pdf_url) to the race boats"""
     if not pdf_race_data_:
         logger.info(f'pdf_racedata:Failed to parse (or fetch)')
         return
@@ -214,6 +233,11 @@ def _parse_and_inject_pdf_intermediates(session, race: model.Race):
     url = race.pdf_url_results
     logger.info(f'pdf_results:Fetch & parse PDF results url="{url}"')
     pdf_parser_result__, _ = pdf_result.extract_data_from_pdf_urls([url])
+    _inject_pdf_intermediates(session=session, race=race, pdf_parser_result__=pdf_parser_result__)
+
+
+def _inject_pdf_intermediates(session, race: model.Race, pdf_parser_result__: dict):
+    """Merge stage: writes parsed results (see pdf_result.extract_data_from_pdf_urls) as intermediates"""
     if not pdf_parser_result__:
         logger.info(f'pdf_results:Failed to parse (or fetch)')
         return
@@ -257,66 +281,203 @@ def _parse_and_inject_pdf_intermediates(session, race: model.Race):
     
 
 
-def _scrape_competition(session, competition: model.Competition, parse_pdf_race_data=True, parse_pdf_intermediates=True):
+def _get_pdf_parser_pool():
+    """Returns the process pool shared by all workers of scrape() (created on first use) or None if disabled"""
+    global _pdf_parser_pool
+    if SCRAPER_PDF_PARSER_PROCESSES < 1:
+        return None
+    with _pdf_parser_pool_lock:
+        if _pdf_parser_pool == None:
+            # spawn: forking a process with running threads (scrape workers, db connections) is unsafe
+            _pdf_parser_pool = ProcessPoolExecutor(
+                max_workers=SCRAPER_PDF_PARSER_PROCESSES, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pdf_parser_pool
+
+
+def _shutdown_pdf_parser_pool():
+    global _pdf_parser_pool
+    with _pdf_parser_pool_lock:
+        if _pdf_parser_pool != None:
+            _pdf_parser_pool.shutdown()
+            _pdf_parser_pool = None
+
+
+def _submit_pdf_parser(parse_func, url) -> Future:
+    """Runs parse_func([url]) in the process pool (or right away if the pool is disabled).
+    parse_func has to be picklable and return plain data, e.g. pdf_result.extract_data_from_pdf_urls"""
+    pool = _get_pdf_parser_pool()
+    if pool != None:
+        return pool.submit(parse_func, [url])
+
+    future = Future()
+    try:
+        future.set_result(parse_func([url]))
+    except Exception as error:
+        future.set_exception(error)
+    return future
+
+
+def _scrape_competition(session, competition: model.Competition, parse_pdf_race_data=True, parse_pdf_intermediates=True) -> int:
+    """Returns number of PDFs fetched & parsed or None if the competition is unchanged (nothing written)"""
     uuid = competition.additional_id_
     assert not uuid == None
 
     logger.info(f'''Fetching competition="{uuid}" year="{competition.year}" name="{competition.name}"''')
     competition_data = api.get_by_competition_id_(comp_ids=[uuid], parse_pdf=False)
 
-    logger.info(f"Write competition to database")
-    # let's use the mapper func directly since we already have the ORM instance
-    competition = dbutils.wr_map_competition_scrape(session, competition, competition_data)
-    session.commit() # TODO: consider removing multiple commits
-
+    changes = change_detection.detect(session, competition, competition_data)
+    if change_detection.is_unchanged(changes):
+        logger.info(f"Competition unchanged since last scrape; Skip")
+        change_detection.mark_checked(session, competition)
+        return None
+
+    logger.info(f"Write competition to database (races changed: {len(changes.remap_races)}/{len(changes.race_digests)})")
+    with _mapping_lock:
+        # let's use the mapper func directly since we already have the ORM instance
+        competition_data_ = change_detection.prune(competition_data, changes)
+        uuid_resolution = nullcontext()
+        if SCRAPER_BATCHED_UUID_RESOLUTION:
+            uuid_resolution = dbutils.batched_uuid_resolution(session, competition_data_)
+        with uuid_resolution:
+            competition = dbutils.wr_map_competition_scrape(session, competition, competition_data_)
+        session.commit() # TODO: consider removing multiple commits
+
+    # parse stage: all PDFs of the competition are fetched & parsed in the process pool
+    jobs = []
     for event in competition.events:
         race: model.Race
         for race in event.races:
-            if parse_pdf_intermediates or parse_pdf_race_data:
-                logger.info(f'Begin PDF injection for race="{race.additional_id_}"')
-            if parse_pdf_intermediates:
-                _parse_and_inject_pdf_intermediates(session=session, race=race)
-            if parse_pdf_race_data:
-                _parse_and_inject_pdf_race_data(session=session, race=race)
+            race_uuid = race.additional_id_
+            # remapping overwrites intermediates from the results PDF -> inject them again
+            if parse_pdf_intermediates and race_uuid in changes.remap_races and race.pdf_url_results:
+                url = race.pdf_url_results
+                logger.info(f'pdf_results:Fetch & parse PDF results url="{url}"')
+                future = _submit_pdf_parser(pdf_result.extract_data_from_pdf_urls, url)
+                jobs.append((race, future, _inject_pdf_intermediates))
+            if parse_pdf_race_data and race_uuid in changes.race_data_races and race.pdf_url_race_data:
+                url = race.pdf_url_race_data
+                logger.info(f'pdf_racedata:Fetch & parse PDF race data url="{url}"')
+                future = _submit_pdf_parser(pdf_race_data.extract_data_from_pdf_url, url)
+                jobs.append((race, future, _inject_pdf_race_data))
+
+    # merge stage: serialized in this session
+    failed = {_inject_pdf_intermediates: set(), _inject_pdf_race_data: set()}
+    for race, future, inject in jobs:
+        logger.info(f'Begin PDF injection for race="{race.additional_id_}"')
+        try:
+            parsed, _ = future.result()
+        except Exception as error:
+            logger.error(f'Failed to parse PDF of race="{race.additional_id_}": {error}')
+            parsed = None
+        if not parsed:
+            failed[inject].add(race.additional_id_) # retried by the next scrape
+        inject(session, race, parsed)
+
+    if competition_data:
+        change_detection.store(session, competition, changes, failed_results=failed[_inject_pdf_intermediates],
+                               failed_race_data=failed[_inject_pdf_race_data])
     session.commit()
+    return len(jobs)
 
-def scrape(parse_pdf=True):
-    LEVEL_PRESCRAPED    = model.Enum_Maintenance_Level.world_rowing_api_prescraped.value
-    LEVEL_SCRAPED       = model.Enum_Maintenance_Level.world_rowing_api_scraped.value
+def _scrape_competition_by_id(competition_id, parse_pdf=True, attempts=2) -> dict:
+    """Scrapes a single competition using the (thread-local) session of the calling worker.
+    Errors are logged and do not affect other competitions. Returns dict with keys: scraped (data written), pdfs"""
+    LEVEL_SCRAPED = model.Enum_Maintenance_Level.world_rowing_api_scraped.value
 
+    result = {"scraped": False, "pdfs": 0}
     with model.Scoped_Session() as session:
-        competitions_iter, num_competitions = _get_competitions_to_scrape(session=session)
-        logger.info(f"Competitions that have to be scraped N={num_competitions}")
-
-        competition: model.Competition
-        for competition in tqdm(competitions_iter):
+        for attempt in range(1, attempts+1):
+            competition: model.Competition = session.get(model.Competition, competition_id)
             competition_uuid = competition.additional_id_
             logger.info(f'Competition uuid="{competition_uuid}"')
             try:
                 if not competition_uuid:
                     logger.error(f"Competition with id={competition.id} has no UUID (w.r.t. World Rowing API); Skip")
-                    continue
-                
+                    break
+
                 scrape = True
                 if competition.scraper_maintenance_level in [LEVEL_SCRAPED]:
                     scrape = _competition_within_rescrape_window(comp=competition)
 
                 if scrape:
                     # this also advances the maintenance_level
-                    _scrape_competition(
+                    pdfs = _scrape_competition(
                         session=session,
                         competition=competition,
                         parse_pdf_intermediates=parse_pdf,
                         parse_pdf_race_data=parse_pdf,
                     )
 
-                    # mark competition as SCRAPED along with date for rescrape logic
+                    # mark competition as SCRAPED along with date for rescrape logic; the date is only advanced if
+                    # data was written (not for unchanged competitions, see change_detection)
                     competition.scraper_maintenance_level = LEVEL_SCRAPED
-                    competition.scraper_last_scrape = datetime.datetime.now()
+                    if pdfs != None:
+                        competition.scraper_last_scrape = datetime.datetime.now()
+                        result["pdfs"] = pdfs
+                        result["scraped"] = True
 
                 session.commit()
+                break
             except Exception as error:
+                session.rollback()
+                # concurrent workers may insert the same entity (e.g. an athlete of both competitions) -> retry
+                if isinstance(error, IntegrityError) and attempt < attempts:
+                    logger.warning(f'Conflict while scraping Competition uuid="{competition_uuid}"; Retry')
+                    continue
                 logger.error(f'ERROR while scraping Competition uuid="{competition_uuid}"')
                 logger.error(str(error))
                 if SCRAPER_DEV_MODE:
-                    raise error
\ No newline at end of file
+                    raise error
+                break
+    return result
+
+
+class _Throughput:
+    """Logs the progress of scrape() in competitions/min and PDFs/min"""
+    def __init__(self, num_competitions):
+        self.num_competitions = num_competitions
+        self.start = time.monotonic()
+        self.visited, self.scraped, self.pdfs = 0, 0, 0
+
+    def add(self, result: dict):
+        self.visited += 1
+        self.scraped += int(result["scraped"])
+        self.pdfs += result["pdfs"]
+        if result["scraped"]:
+            self.log()
+
+    def log(self, prefix="Progress"):
+        minutes = max(time.monotonic() - self.start, 1e-9) / 60
+        logger.info(
+            f"{prefix}: visited={self.visited}/{self.num_competitions} scraped={self.scraped} pdfs={self.pdfs}"
+            f" competitions/min={self.scraped/minutes:.2f} PDFs/min={self.pdfs/minutes:.1f}"
+        )
+
+
+def scrape(parse_pdf=True, workers=SCRAPER_WORKERS):
+    with model.Scoped_Session() as session:
+        competitions, num_competitions = _get_competitions_to_scrape(session=session)
+        competition_ids = [competition.id for competition in competitions]
+    logger.info(f"Competitions that have to be scraped N={num_competitions} workers={workers}")
+
+    throughput = _Throughput(num_competitions)
+    try:
+        if workers <= 1:
+            for competition_id in tqdm(competition_ids):
+                throughput.add(_scrape_competition_by_id(competition_id, parse_pdf=parse_pdf))
+        else:
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scrape") as executor:
+                futures = [
+                    executor.submit(_scrape_competition_by_id, competition_id, parse_pdf=parse_pdf)
+                    for competition_id in competition_ids
+                ]
+                for future in as_completed(futures):
+                    throughput.add(future.result())
+    finally:
+        _shutdown_pdf_parser_pool()
+    throughput.log(prefix="Scraping finished")
+    # PDFs are downloaded by the PDF parser processes; their connections are not part of these stats
+    http_client.log_connection_stats(logger=logger)
+    json_cache.log_stats(logger=logger)
+    pdf_cache.log_stats(logger=logger)
@@ -0,0 +1,100 @@
+"""
+Shared HTTP client for the World Rowing API and PDF downloads.
+
+All requests of a process go through one requests HTTPAdapter, i.e. one urllib3 connection pool per host
+(thread-safe), so connections are kept alive and reused across requests and scraper workers. Each thread gets its own
+requests.Session (Sessions themselves are not thread-safe) with the shared adapter mounted.
+gzip/deflate is negotiated by requests by default (Accept-Encoding).
+"""
+import os
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+# Max. connections kept alive per host; should be >= number of concurrent requests (scraper workers)
+HTTP_POOL_MAXSIZE = int(os.environ.get(
+    'SCRAPER_HTTP_POOL_MAXSIZE', str(max(10, int(os.environ.get('SCRAPER_WORKERS', '1').strip())))
+).strip())
+# Number of hosts whose pools are kept
+HTTP_POOL_HOSTS = 10
+
+_lock = threading.Lock()
+_connects = {} # host -> number of established TCP connections (incl. reconnects of dropped keep-alive connections)
+
+
+def _count_connect(host):
+    with _lock:
+        _connects[host] = _connects.get(host, 0) + 1
+
+
+class _Counting_HTTPConnection(HTTPConnection):
+    def connect(self):
+        _count_connect(self.host)
+        super().connect()
+
+
+class _Counting_HTTPSConnection(HTTPSConnection):
+    def connect(self):
+        _count_connect(self.host)
+        super().connect()
+
+
+class _HTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _Counting_HTTPConnection
+
+
+class _HTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _Counting_HTTPSConnection
+
+
+_adapter = HTTPAdapter(pool_connections=HTTP_POOL_HOSTS, pool_maxsize=HTTP_POOL_MAXSIZE, pool_block=False)
+_adapter.poolmanager.pool_classes_by_scheme = {"http": _HTTPConnectionPool, "https": _HTTPSConnectionPool}
+_local = threading.local()
+
+
+def get_session() -> requests.Session:
+    """Returns the requests.Session of the calling thread"""
+    session = getattr(_local, "session", None)
+    if session == None:
+        session = requests.Session()
+        session.mount("https://", _adapter)
+        session.mount("http://", _adapter)
+        _local.session = session
+    return session
+
+
+def get(url: str, **kwargs) -> requests.Response:
+    """Like requests.get() but with pooled keep-alive connections"""
+    return get_session().get(url, **kwargs)
+
+
+def connection_stats() -> dict:
+    """Returns dict: host -> {"requests", "connections", "reused"} of this process"""
+    requests_by_host = {}
+    pools = _adapter.poolmanager.pools
+    for key in list(pools.keys()):
+        pool = pools.get(key)
+        if pool != None:
+            requests_by_host[pool.host] = requests_by_host.get(pool.host, 0) + pool.num_requests
+
+    stats = {}
+    with _lock:
+        for host, num_requests in requests_by_host.items():
+            connections = _connects.get(host, 0)
+            stats[host] = {"requests": num_requests, "connections": connections, "reused": num_requests - connections}
+    return stats
+
+
+def log_connection_stats(logger=logger):
+    for host, stats in connection_stats().items():
+        logger.info(
+            f'HTTP host="{host}" requests={stats["requests"]} new_connections={stats["connections"]} '
+            f'reused={stats["reused"]}'
+        )
@@ -0,0 +1,166 @@
+"""
+Persistent on-disk cache for World Rowing API (JSON) responses, used by utils_wr.load_json().
+
+Layout of SCRAPER_JSON_CACHE_DIR:
+* <sha256 of url>.body  response body as received
+* <sha256 of url>.json  entry: {"url", "sha256" (of the body), "etag", "last_modified", "encoding", "stored_at"}
+
+Modes (SCRAPER_JSON_CACHE_MODE):
+* "conditional" (default): a cached response is revalidated with If-None-Match/If-Modified-Since; the server answers
+  unchanged payloads with 304 (no body) and the cached body is replayed.
+* "ttl": for servers that ignore validators; a cached response is replayed without any request as long as it is
+  younger than SCRAPER_JSON_CACHE_TTL_SECONDS, afterwards it is downloaded again.
+* "off": every request goes to the server.
+
+In both modes, responses younger than SCRAPER_JSON_CACHE_TTL_SECONDS are served without a request. The default is 0
+in "conditional" mode (always revalidate) and one day in "ttl" mode; "ttl" with a TTL <= 0 is rejected on import
+(every entry would be stale when written).
+Set SCRAPER_JSON_CACHE_DIR to an empty string to disable the cache.
+"""
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from contextlib import suppress
+
+import requests
+
+from . import http_client
+from .pdf_cache import write_atomic
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+JSON_CACHE_DIR = os.environ.get('SCRAPER_JSON_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'rowing_json_cache')).strip()
+JSON_CACHE_MODE = os.environ.get('SCRAPER_JSON_CACHE_MODE', 'conditional').strip().lower()
+
+MODES = ("conditional", "ttl", "off")
+if JSON_CACHE_MODE not in MODES:
+    raise ValueError(f'Invalid SCRAPER_JSON_CACHE_MODE "{JSON_CACHE_MODE}", expected one of {MODES}')
+
+# Seconds a cached response is served without any request. Default per mode: "ttl" one day, otherwise 0 (always
+# revalidate). "ttl" requires a positive value.
+DEFAULT_TTL_SECONDS = {"conditional": 0, "ttl": 24 * 60 * 60, "off": 0}
+JSON_CACHE_TTL_SECONDS = float(
+    os.environ.get('SCRAPER_JSON_CACHE_TTL_SECONDS', str(DEFAULT_TTL_SECONDS[JSON_CACHE_MODE])).strip()
+)
+if JSON_CACHE_MODE == "ttl" and JSON_CACHE_TTL_SECONDS <= 0:
+    raise ValueError(f'SCRAPER_JSON_CACHE_MODE "ttl" requires SCRAPER_JSON_CACHE_TTL_SECONDS > 0, '
+                     f'got {JSON_CACHE_TTL_SECONDS:g}')
+
+_lock = threading.Lock()
+# fresh: served within TTL without request; not_modified: revalidated (304); misses: full download
+stats = {"fresh": 0, "not_modified": 0, "misses": 0, "bytes_saved": 0}
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _paths(url: str) -> tuple:
+    """Returns tuple (entry path, body path)"""
+    key = _sha256(url.encode())
+    return os.path.join(JSON_CACHE_DIR, f"{key}.json"), os.path.join(JSON_CACHE_DIR, f"{key}.body")
+
+
+def _count(stat: str, saved_bytes=0):
+    with _lock:
+        stats[stat] += 1
+        stats["bytes_saved"] += saved_bytes
+
+
+def _read(url: str):
+    """Returns tuple (entry, body) or None"""
+    entry_path, body_path = _paths(url)
+    try:
+        with open(entry_path, "rb") as file:
+            entry = json.load(file)
+        with open(body_path, "rb") as file:
+            body = file.read()
+    except (OSError, ValueError):
+        return None
+    if entry.get("url") != url or _sha256(body) != entry.get("sha256"):
+        # e.g. entry and body written by different processes at the same time
+        return None
+    return entry, body
+
+
+def _write(url: str, response: requests.Response):
+    entry_path, body_path = _paths(url)
+    entry = {
+        "url": url,
+        "sha256": _sha256(response.content),
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+        "encoding": response.encoding,
+        "stored_at": time.time()
+    }
+    try:
+        write_atomic(body_path, response.content)
+        write_atomic(entry_path, json.dumps(entry).encode())
+    except OSError as error:
+        logger.warning(f'Could not write response to cache url="{url}": {error}')
+
+
+def _touch(url: str, entry: dict):
+    """Restarts the TTL of a revalidated entry"""
+    entry_path, _ = _paths(url)
+    entry = {**entry, "stored_at": time.time()}
+    with suppress(OSError):
+        write_atomic(entry_path, json.dumps(entry).encode())
+
+
+def _replay(url: str, entry: dict, body: bytes) -> requests.Response:
+    response = requests.Response()
+    response.status_code = 200
+    response.url = url
+    response._content = body # no public API to set the body of a Response
+    response.encoding = entry.get("encoding") or "utf-8"
+    return response
+
+
+def get(url: str, params=None, **kwargs) -> requests.Response:
+    """Like http_client.get() but answered from the cache if possible (see module docstring). Replayed responses
+    have status code 200."""
+    if not JSON_CACHE_DIR or JSON_CACHE_MODE == "off":
+        return http_client.get(url, params=params, **kwargs)
+
+    url = requests.Request("GET", url, params=params).prepare().url
+    cached = _read(url)
+    if cached != None:
+        entry, body = cached
+        if time.time() - entry["stored_at"] < JSON_CACHE_TTL_SECONDS:
+            _count("fresh", len(body))
+            return _replay(url, entry, body)
+
+    headers = dict(kwargs.pop("headers", None) or {})
+    if cached != None and JSON_CACHE_MODE == "conditional":
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    response = http_client.get(url, headers=headers, **kwargs)
+    if response.status_code == 304 and cached != None:
+        _count("not_modified", len(body))
+        _touch(url, entry)
+        return _replay(url, entry, body)
+
+    _count("misses")
+    if response.status_code == 200 and response.content:
+        has_validators = "ETag" in response.headers or "Last-Modified" in response.headers
+        if JSON_CACHE_TTL_SECONDS > 0 or (JSON_CACHE_MODE == "conditional" and has_validators):
+            _write(url, response)
+    return response
+
+
+def log_stats(logger=logger):
+    with _lock:
+        current = dict(stats)
+    logger.info(
+        f'JSON cache mode="{JSON_CACHE_MODE}" fresh={current["fresh"]} not_modified={current["not_modified"]} '
+        f'misses={current["misses"]} saved={current["bytes_saved"]/1024/1024:.1f}MB'
+    )
@@ -0,0 +1,277 @@
+"""
+Persistent on-disk cache for World Rowing PDFs.
+
+Layout of SCRAPER_PDF_CACHE_DIR:
+* objects/<sha256>.pdf      PDF content, addressed by its SHA-256 (identical documents are stored once)
+* urls/<sha256 of url>.json  index entry: {"url", "sha256", "size", "etag", "last_modified", "first_seen"}
+* parsed/<namespace>/<sha256>.json  parse result of a PDF (see get_parsed/put_parsed); the namespace contains the
+  parser module and its version, so a parser upgrade invalidates only its own results. Not subject to eviction.
+
+World Rowing replaces PDFs at the same URL (e.g. provisional -> official results). Index entries whose content was
+first seen less than SCRAPER_PDF_CACHE_REVALIDATE_DAYS ago (default: the scraper's rescrape limit) are therefore
+revalidated on every fetch with a conditional request (If-None-Match/If-Modified-Since, or a full download if the
+server sent no validators). Content unchanged for longer is considered final and served without a request.
+invalidate() drops the entry of a URL. Parse results are keyed by content hash, i.e. a replaced PDF is parsed again.
+
+The modification time of an object is its last access. If the objects exceed SCRAPER_PDF_CACHE_MAX_MB, the least
+recently used ones are evicted. All files are written atomically (temp file + rename), so several processes (e.g. the
+PDF parser pool of the scraper) can share the directory. Set SCRAPER_PDF_CACHE_DIR to an empty string to disable it.
+"""
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from contextlib import suppress
+
+from . import http_client, recorder
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+PDF_CACHE_DIR = os.environ.get('SCRAPER_PDF_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'rowing_pdf_cache')).strip()
+PDF_CACHE_MAX_BYTES = int(os.environ.get('SCRAPER_PDF_CACHE_MAX_MB', '2048').strip()) * 1024 * 1024
+PDF_CACHE_REVALIDATE_SECONDS = float(os.environ.get(
+    'SCRAPER_PDF_CACHE_REVALIDATE_DAYS', os.environ.get('SCRAPER_RESCRAPE_LIMIT_DAYS', '45')
+).strip()) * 24 * 60 * 60
+
+# evict down to this fraction of PDF_CACHE_MAX_BYTES to avoid evicting on every put
+_EVICTION_TARGET = .9
+
+_lock = threading.Lock()
+_cached_bytes = None # approximation of the cache size (per process); None -> not yet known
+_stats_lock = threading.Lock() # fetch() runs in the scraper's worker threads
+# hits: served without request; not_modified: revalidated (304); misses: downloaded
+stats = {"hits": 0, "not_modified": 0, "misses": 0}
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _count(stat: str):
+    with _stats_lock:
+        stats[stat] += 1
+
+
+def stats_snapshot() -> dict:
+    """Returns a consistent copy of stats"""
+    with _stats_lock:
+        return dict(stats)
+
+
+def content_hash(content: bytes) -> str:
+    """Returns the key of a PDF's content (SHA-256)"""
+    return _sha256(content)
+
+
+def _object_path(digest: str) -> str:
+    return os.path.join(PDF_CACHE_DIR, "objects", f"{digest}.pdf")
+
+
+def _index_path(url: str) -> str:
+    return os.path.join(PDF_CACHE_DIR, "urls", f"{_sha256(url.encode())}.json")
+
+
+def _parsed_path(namespace: str, digest: str) -> str:
+    return os.path.join(PDF_CACHE_DIR, "parsed", namespace, f"{digest}.json")
+
+
+def _json_default(obj):
+    # numpy scalars (e.g. from pandas/camelot)
+    if hasattr(obj, "item"):
+        return obj.item()
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+
+def write_atomic(path: str, data: bytes):
+    """Writes data to path via a temp file + rename, i.e. readers never see partially written files"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as file:
+            file.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+
+def _list_objects() -> list:
+    """Returns list of (mtime, size, path) of all cached objects"""
+    objects = []
+    with suppress(FileNotFoundError):
+        for entry in os.scandir(os.path.join(PDF_CACHE_DIR, "objects")):
+            if entry.name.endswith(".pdf"):
+                with suppress(OSError): # e.g. evicted by another process meanwhile
+                    stat = entry.stat()
+                    objects.append((stat.st_mtime, stat.st_size, entry.path))
+    return objects
+
+
+def _evict_if_needed(added_bytes: int):
+    global _cached_bytes
+    with _lock:
+        if _cached_bytes == None:
+            _cached_bytes = sum(size for _, size, _ in _list_objects())
+        else:
+            _cached_bytes += added_bytes
+        if _cached_bytes <= PDF_CACHE_MAX_BYTES:
+            return
+
+        objects = sorted(_list_objects())
+        total = sum(size for _, size, _ in objects)
+        evicted = 0
+        for _, size, path in objects:
+            if total <= PDF_CACHE_MAX_BYTES * _EVICTION_TARGET:
+                break
+            with suppress(FileNotFoundError):
+                os.remove(path)
+                evicted += 1
+            total -= size
+        _cached_bytes = total
+        logger.info(f"Evicted {evicted} PDFs from cache; size={total/1024/1024:.1f}MB")
+
+
+def _read(url: str):
+    """Returns tuple (index entry, content) or None"""
+    if not PDF_CACHE_DIR:
+        return None
+    try:
+        with open(_index_path(url), "rb") as file:
+            entry = json.load(file)
+        path = _object_path(entry["sha256"])
+        with open(path, "rb") as file:
+            content = file.read()
+    except (OSError, ValueError, KeyError):
+        return None
+    if _sha256(content) != entry["sha256"]:
+        logger.warning(f'Corrupt cache entry for url="{url}"; ignore')
+        return None
+    now = time.time()
+    with suppress(OSError):
+        os.utime(path, (now, now)) # LRU: mtime is last access
+    return entry, content
+
+
+def _needs_revalidation(entry: dict) -> bool:
+    first_seen = entry.get("first_seen") # None: entry written before revalidation existed
+    return first_seen == None or time.time() - first_seen < PDF_CACHE_REVALIDATE_SECONDS
+
+
+def get(url: str):
+    """Returns cached content of url or None (regardless of whether it needs revalidation)"""
+    cached = _read(url)
+    return cached[1] if cached != None else None
+
+
+def invalidate(url: str):
+    """Drops the index entry of url, i.e. the next fetch() downloads it again"""
+    if not PDF_CACHE_DIR:
+        return
+    with suppress(FileNotFoundError):
+        os.remove(_index_path(url))
+
+
+def _write_entry(url: str, entry: dict):
+    try:
+        write_atomic(_index_path(url), json.dumps(entry).encode())
+    except OSError as error:
+        logger.warning(f'Could not write PDF cache index url="{url}": {error}')
+
+
+def put(url: str, content: bytes, headers=None, previous: dict = None) -> str:
+    """Stores content of url in the cache and returns its SHA-256. headers: of the response (validators);
+    previous: index entry of the former content (first_seen is kept if the content did not change)"""
+    digest = _sha256(content)
+    if not PDF_CACHE_DIR:
+        return digest
+    headers = headers or {}
+    try:
+        path = _object_path(digest)
+        if not os.path.exists(path):
+            write_atomic(path, content)
+            _evict_if_needed(len(content))
+    except OSError as error:
+        logger.warning(f'Could not write PDF to cache url="{url}": {error}')
+        return digest
+    unchanged = previous != None and previous.get("sha256") == digest and "first_seen" in previous
+    _write_entry(url, {
+        "url": url,
+        "sha256": digest,
+        "size": len(content),
+        "etag": headers.get("ETag"),
+        "last_modified": headers.get("Last-Modified"),
+        "first_seen": previous["first_seen"] if unchanged else time.time()
+    })
+    return digest
+
+
+def fetch(url: str, timeout=20) -> tuple:
+    """Returns tuple (status_code, content) of the PDF behind url. Served from the cache (status_code 200) if possible,
+    otherwise downloaded and (if successful) stored in the cache; recent entries are revalidated (see module
+    docstring). See recorder regarding record/replay."""
+    replayed = recorder.replay(url)
+    if replayed != None:
+        return replayed.status_code, replayed.content
+
+    cached = _read(url)
+    headers = {}
+    if cached != None:
+        entry, content = cached
+        if not _needs_revalidation(entry):
+            _count("hits")
+            recorder.record(url, 200, content)
+            return 200, content
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    response = http_client.get(url, timeout=timeout, headers=headers)
+    if response.status_code == 304 and cached != None:
+        _count("not_modified")
+        if not "first_seen" in entry:
+            _write_entry(url, {**entry, "first_seen": time.time()})
+        recorder.record(url, 200, content)
+        return 200, content
+
+    _count("misses")
+    if response.status_code == 200:
+        digest = put(url, response.content, headers=response.headers, previous=cached[0] if cached != None else None)
+        if cached != None and digest != entry["sha256"]:
+            logger.info(f'PDF changed url="{url}"')
+    recorder.record(url, response.status_code, response.content)
+    return response.status_code, response.content
+
+
+def log_stats(logger=logger):
+    current = stats_snapshot()
+    logger.info(
+        f'PDF cache hits={current["hits"]} not_modified={current["not_modified"]} misses={current["misses"]}'
+    )
+
+
+def get_parsed(namespace: str, digest: str):
+    """Returns the cached parse result of the PDF with the given content hash or None"""
+    if not PDF_CACHE_DIR:
+        return None
+    try:
+        with open(_parsed_path(namespace, digest), "rb") as file:
+            return json.load(file)["data"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def put_parsed(namespace: str, digest: str, data):
+    """Stores a (JSON serializable) parse result of the PDF with the given content hash"""
+    if not PDF_CACHE_DIR:
+        return
+    try:
+        write_atomic(_parsed_path(namespace, digest), json.dumps({"data": data}, default=_json_default).encode())
+    except (OSError, TypeError, ValueError) as error:
+        logger.warning(f'Could not write parse result to cache namespace="{namespace}": {error}')
@@ -22,6 +22,7 @@ import tempfile
 import os
 
 #from utils_general import write_to_json
+from . import pdf_cache
 from .utils_pdf import (handle_table_partitions, get_data_loc, print_stats, find_distance_column,
                        clean_df, get_string_loc, check_speed_stroke, reset_axis, clean_str)
 import logging
@@ -35,6 +36,9 @@ START_YEAR = 2010
 END_YEAR = 2022
 # special codes for the country line, which could affect the detection --> list contains values that are excluded
 SPECIAL_NAMES_FOR_COUNTRY_ROW = ["NPC", "NOC"]
+# bump whenever the extracted data changes; parse results of older versions are not reused (see pdf_cache)
+PARSER_VERSION = 1
+PARSER_NAMESPACE = f"pdf_race_data.v{PARSER_VERSION}"
 
 
 def read_race_data(df: pd.DataFrame) -> Union[dict, None]:
@@ -152,26 +156,32 @@ def extract_data_from_pdf_url(urls: list) -> tuple[dict, list]:
 
     for url in urls:
         try:
-            #Download PDF bytes
-            response = requests.get(url, timeout=20)
-            if response.status_code != 200:
-                logger.error(f"Failed to download PDF from {url}, status code {response.status_code}")
+            #Download PDF bytes (or read them from the PDF cache)
+            status_code, content = pdf_cache.fetch(url, timeout=20)
+            if status_code != 200:
+                logger.error(f"Failed to download PDF from {url}, status code {status_code}")
                 failed_reqs.append(url)
                 continue
 
-            #Save PDF to a temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-                tmp_file.write(response.content)
-                tmp_path = tmp_file.name
-
-            # read data via camelot
-            tables = camelot.read_pdf(tmp_path, flavor="stream", pages="all")
-            # handle data that is spread across multiple pages, linebreaks and empty columns
-            df = handle_table_partitions(tables=tables, results=False)
-            # extract relevant data and return dict
-            data_dict = read_race_data(df=df)
-            # exclude files that are below a specific limit of relevant data values
-            race_data_list = exclude_empty_files(data=data_dict, limit=5)
+            # unchanged documents skip camelot
+            digest = pdf_cache.content_hash(content)
+            race_data_list = pdf_cache.get_parsed(PARSER_NAMESPACE, digest)
+
+            if race_data_list == None:
+                #Save PDF to a temporary file
+                with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
+                    tmp_file.write(content)
+                    tmp_path = tmp_file.name
+
+                # read data via camelot
+                tables = camelot.read_pdf(tmp_path, flavor="stream", pages="all")
+                # handle data that is spread across multiple pages, linebreaks and empty columns
+                df = handle_table_partitions(tables=tables, results=False)
+                # extract relevant data and return dict
+                data_dict = read_race_data(df=df)
+                # exclude files that are below a specific limit of relevant data values
+                race_data_list = exclude_empty_files(data=data_dict, limit=5)
+                pdf_cache.put_parsed(PARSER_NAMESPACE, digest, race_data_list)
 
             if race_data_list:
                 final_data["url"] = url
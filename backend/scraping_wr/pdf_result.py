@@ -21,6 +21,7 @@ import tempfile
 import os
 
 #from .utils_general import write_to_json
+from . import pdf_cache
 from .utils_pdf import (clean, clean_df, get_string_loc, handle_table_partitions,
                        clean_str, print_stats)
 import logging
@@ -35,6 +36,9 @@ COMPETITION_LIMIT = 1000
 START_YEAR = 2011
 END_YEAR = 2021
 EVERY_NTH_DOCUMENT = 25
+# bump whenever the extracted data changes; parse results of older versions are not reused (see pdf_cache)
+PARSER_VERSION = 1
+PARSER_NAMESPACE = f"pdf_result.v{PARSER_VERSION}"
 
 
 def get_athletes(df: pd.DataFrame, rows: list, i: int) -> list:
@@ -149,6 +153,14 @@ def check_extracted_data(data: dict) -> dict:
     return data
 
 
+def _from_cached_data(cached_data: list) -> list:
+    """Restores parse results read from the cache: JSON turned the (int) distance keys of "times" into strings"""
+    for boat in cached_data:
+        if isinstance(boat.get("times"), dict):
+            boat["times"] = {int(key): time for key, time in boat["times"].items()}
+    return cached_data
+
+
 def extract_data_from_pdf_urls(urls: list) -> tuple[dict, list]:
     """
     This function extracts relevant data from the result data pdfs.
@@ -163,22 +175,27 @@ def extract_data_from_pdf_urls(urls: list) -> tuple[dict, list]:
     tmp_path = None
 
     for url in urls:
-        boat_data, tables = {}, []
+        boat_data, tables, digest, cached_data = {}, [], None, None
         try:
-            #Download PDF bytes
-            response = requests.get(url, timeout=20)
-            if response.status_code != 200:
-                logger.error(f"Failed to download PDF from {url}, status code {response.status_code}")
+            #Download PDF bytes (or read them from the PDF cache)
+            status_code, content = pdf_cache.fetch(url, timeout=20)
+            if status_code != 200:
+                logger.error(f"Failed to download PDF from {url}, status code {status_code}")
                 failed_requests.append(url)
                 continue
 
-            #Save PDF to a temporary file
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
-                tmp_file.write(response.content)
-                tmp_path = tmp_file.name
+            # unchanged documents skip camelot
+            digest = pdf_cache.content_hash(content)
+            cached_data = pdf_cache.get_parsed(PARSER_NAMESPACE, digest)
 
-            # Read file with camelot
-            tables = camelot.read_pdf(tmp_path, flavor="stream", pages="all", column_tol=2)
+            if cached_data == None:
+                #Save PDF to a temporary file
+                with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp_file:
+                    tmp_file.write(content)
+                    tmp_path = tmp_file.name
+
+                # Read file with camelot
+                tables = camelot.read_pdf(tmp_path, flavor="stream", pages="all", column_tol=2)
 
         except NotImplementedError:
             logger.error(f" PDF not accessible – ignore file...")
@@ -194,7 +211,9 @@ def extract_data_from_pdf_urls(urls: list) -> tuple[dict, list]:
                     logger.warning(f"Failed to delete temp file {tmp_path}: {e}")
 
 
-        if tables:
+        if cached_data != None:
+            data = _from_cached_data(cached_data)
+        elif tables:
             try:
                 # prepare df
                 df = clean(handle_table_partitions(tables=tables, results=True))
@@ -223,19 +242,24 @@ def extract_data_from_pdf_urls(urls: list) -> tuple[dict, list]:
                 elif df.empty:
                     data = []
 
-                if data:
-                    final_data["url"] = url
-                    final_data["data"] = data
-
-                    logger.debug(f"Extract of {url.split('/').pop()} successful.")
-                else:
-                    empty_files += 1
-                    logger.warning(f"Empty file found: {url.split('/').pop()}.")
+                pdf_cache.put_parsed(PARSER_NAMESPACE, digest, data)
 
             except Exception as e:
                 errors += 1
                 failed_requests.append(url)
                 logger.exception(f"Error at {url}: {e}.")
+                continue
+        else:
+            continue
+
+        if data:
+            final_data["url"] = url
+            final_data["data"] = data
+
+            logger.debug(f"Extract of {url.split('/').pop()} successful.")
+        else:
+            empty_files += 1
+            logger.warning(f"Empty file found: {url.split('/').pop()}.")
 
     total = len(urls) - empty_files
     rate = "{:.2f}".format(100 - ((errors / total if total else 0) * 100))
@@ -0,0 +1,129 @@
+"""
+Record/replay of the World Rowing API responses (utils_wr.load_json) and PDF downloads (pdf_cache.fetch), e.g. to
+profile or regression test the scraper (scraper.py --record/--replay) without network access.
+
+* record: responses are fetched as usual (including the JSON/PDF caches) and written to SCRAPER_FIXTURES_DIR
+* replay: responses are read from SCRAPER_FIXTURES_DIR only; there are no requests at all. Requests that were not
+  recorded are answered with status code 404 (and counted, see log_stats)
+
+Layout of SCRAPER_FIXTURES_DIR (one fixture per url incl. query):
+* <sha256 of url>.json  {"url", "status_code", "encoding", "sha256" (of the body)}
+* <sha256 of url>.body  response body
+
+The mode is read from the environment (SCRAPER_FIXTURES_MODE, SCRAPER_FIXTURES_DIR) on every call, so processes
+spawned after configure() (e.g. the PDF parser pool of the scraper) use the same fixtures.
+"""
+import os
+import json
+import hashlib
+import threading
+
+import requests
+
+from . import pdf_cache
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+MODES = ("record", "replay")
+
+_lock = threading.Lock()
+stats = {"recorded": 0, "replayed": 0, "missing": 0}
+
+
+def configure(mode: str, directory: str):
+    """Enables recording or replaying (mode in MODES) for this process and processes spawned afterwards"""
+    if not mode in MODES:
+        raise ValueError(f'Invalid fixtures mode "{mode}", expected one of {MODES}')
+    os.environ['SCRAPER_FIXTURES_MODE'] = mode
+    os.environ['SCRAPER_FIXTURES_DIR'] = os.path.abspath(directory)
+    logger.info(f'Fixtures mode="{mode}" dir="{os.environ["SCRAPER_FIXTURES_DIR"]}"')
+
+
+def _mode() -> str:
+    mode = os.environ.get('SCRAPER_FIXTURES_MODE', '').strip().lower()
+    return mode if mode in MODES else ''
+
+
+def _paths(url: str) -> tuple:
+    """Returns tuple (meta path, body path)"""
+    directory = os.environ.get('SCRAPER_FIXTURES_DIR', 'fixtures').strip()
+    key = hashlib.sha256(url.encode()).hexdigest()
+    return os.path.join(directory, f"{key}.json"), os.path.join(directory, f"{key}.body")
+
+
+def _full_url(url: str, params=None) -> str:
+    return requests.Request("GET", url, params=params).prepare().url
+
+
+def _count(stat: str):
+    with _lock:
+        stats[stat] += 1
+
+
+def is_replaying() -> bool:
+    return _mode() == "replay"
+
+
+def replay(url: str, params=None):
+    """Returns the recorded response (requests.Response) of url in replay mode, otherwise None"""
+    if not is_replaying():
+        return None
+
+    url = _full_url(url, params)
+    meta_path, body_path = _paths(url)
+    response = requests.Response()
+    response.url = url
+    try:
+        with open(meta_path, "rb") as file:
+            meta = json.load(file)
+        with open(body_path, "rb") as file:
+            body = file.read()
+    except (OSError, ValueError):
+        logger.warning(f'No fixture recorded for url="{url}"')
+        _count("missing")
+        response.status_code = 404
+        response._content = b""
+        return response
+
+    response.status_code = meta["status_code"]
+    response._content = body # no public API to set the body of a Response
+    response.encoding = meta.get("encoding") or "utf-8"
+    _count("replayed")
+    return response
+
+
+def record(url: str, status_code: int, content: bytes, params=None, encoding=None):
+    """Stores a response in record mode (otherwise no-op)"""
+    if _mode() != "record":
+        return
+
+    url = _full_url(url, params)
+    meta_path, body_path = _paths(url)
+    content = content or b""
+    meta = {
+        "url": url,
+        "status_code": status_code,
+        "encoding": encoding,
+        "sha256": hashlib.sha256(content).hexdigest()
+    }
+    try:
+        pdf_cache.write_atomic(body_path, content)
+        pdf_cache.write_atomic(meta_path, json.dumps(meta).encode())
+    except OSError as error:
+        logger.error(f'Could not record url="{url}": {error}')
+        return
+    _count("recorded")
+
+
+def log_stats(logger=logger):
+    mode = _mode()
+    if not mode:
+        return
+    with _lock:
+        current = dict(stats)
+    logger.info(
+        f'Fixtures mode="{mode}" recorded={current["recorded"]} replayed={current["replayed"]} '
+        f'missing={current["missing"]}'
+    )
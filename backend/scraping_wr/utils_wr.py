@@ -7,6 +7,7 @@ import requests
 import pandas as pd
 import numpy as np
 
+from . import json_cache, recorder
 
 import logging
 logger = logging.getLogger(__name__)
@@ -77,6 +78,8 @@ def load_json(url: str, content_field='data', params=None, timeout=20., **kwargs
     """
     Loads any json from any URL.
     The function will be retried, if the endpoint might not be reachable atm.
+    Responses are cached on disk and revalidated with conditional requests (see json_cache) and can be
+    recorded/replayed (see recorder).
     ------------
     :param url: str - A url to an endpoint, that might contain a filter string
     :param params: not used
@@ -86,7 +89,10 @@ def load_json(url: str, content_field='data', params=None, timeout=20., **kwargs
     """
     res = None
     try:
-        res = requests.get(url, params=params, timeout=timeout, **kwargs)
+        res = recorder.replay(url, params=params)
+        if res == None:
+            res = json_cache.get(url, params=params, timeout=timeout, **kwargs)
+            recorder.record(url, res.status_code, res.content, params=params, encoding=res.encoding)
         res.raise_for_status()
     except (Exception, ) as e:
         logger.error(f"Error appeared during get(). \n\tStatuscode: {res.status_code}\n\tURL: {url}")
@@ -0,0 +1,103 @@
+"""
+Shared fixtures. Tests run against a dedicated PostgreSQL database (TEST_PGDATABASE, default "rowing_test"); it is
+dropped and recreated per test session, never the one configured by PGDATABASE. Tests that need the database are
+skipped if it is not reachable:
+
+    createdb rowing_test
+    python -m pytest
+"""
+import os
+import re
+import json
+from pathlib import Path
+
+# must happen before model.model creates its engine
+os.environ["PGDATABASE"] = os.environ.get("TEST_PGDATABASE", "rowing_test")
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import OperationalError
+
+from model import model, dbutils
+
+
+# seed_world_cups() parameters of the world_cups fixture: 16 races per year for every crew
+WORLD_CUP_YEARS = 13
+WORLD_CUP_FIRST_YEAR = 2010
+
+EXAMPLE_COMPETITION = Path(__file__).parents[2] / "doc" / "examples" / "competition.json"
+
+
+@pytest.fixture(scope="session")
+def database():
+    """Empty tables in the test database"""
+    try:
+        with model.engine.connect():
+            pass
+    except OperationalError as error:
+        pytest.skip(f'Test database "{model.engine.url.database}" not available: {error.orig}')
+    dbutils.drop_all_tables(model.engine)
+    dbutils.create_tables(model.engine)
+    yield model.engine
+    model.Scoped_Session.remove()
+
+
+@pytest.fixture(scope="session")
+def world_cups(database):
+    """Synthetic World Cups (see benchmarks.synthetic.seed_world_cups), seeded once per session"""
+    from benchmarks import synthetic
+    synthetic.seed_world_cups(years=WORLD_CUP_YEARS, first_year=WORLD_CUP_FIRST_YEAR, heats=2, lanes=6, gps_points=10)
+    model.Scoped_Session.remove()
+    return synthetic
+
+
+@pytest.fixture
+def example_competition(database):
+    """Competition payload of the World Rowing API (doc/examples/competition.json)"""
+    with open(EXAMPLE_COMPETITION, mode="r", encoding="utf-8") as fp:
+        competition_data = json.load(fp)
+
+    # boat classes are unique by abbreviation; those seeded by other tests become the World Rowing ones
+    with model.Scoped_Session() as session:
+        for event in competition_data["events"]:
+            boat_class = event["boatClass"]
+            statement = select(model.Boat_Class).where(model.Boat_Class.abbreviation == boat_class["DisplayName"])
+            for existing in session.execute(statement).scalars():
+                existing.additional_id_ = boat_class["id"].lower()
+        session.commit()
+    return competition_data
+
+
+@pytest.fixture(scope="session")
+def app():
+    from api.app import app
+    app.config["TESTING"] = True
+    return app
+
+
+@pytest.fixture
+def client(app):
+    yield app.test_client()
+    model.Scoped_Session.remove()
+
+
+@pytest.fixture
+def sql_instrumentation(app, monkeypatch):
+    """Enables api.sql_instrumentation (Server-Timing header, see sql_queries()) and returns app.config to set a query
+    budget: sql_instrumentation["SQL_QUERY_BUDGET"] = {"get_athlete": 2}. Exceeding it raises Query_Budget_Exceeded."""
+    monkeypatch.setitem(app.config, "SQL_INSTRUMENTATION", True)
+    monkeypatch.setitem(app.config, "SQL_QUERY_BUDGET", None)
+    monkeypatch.setitem(app.config, "SQL_QUERY_BUDGET_STRICT", False)
+    return app.config
+
+
+def sql_queries(response) -> int:
+    """Number of SQL statements of a request from its Server-Timing header (see sql_instrumentation)"""
+    return int(re.search(r'db;dur=[0-9.]+;desc="(\d+) queries"', response.headers["Server-Timing"]).group(1))
+
+
+@pytest.fixture(scope="session")
+def auth_headers(app):
+    from flask_jwt_extended import create_access_token
+    with app.app_context():
+        return {"Authorization": f"Bearer {create_access_token(identity='test')}"}
@@ -0,0 +1,56 @@
+import json
+
+import pytest
+from sqlalchemy import select, func
+
+from model import model
+
+
+@pytest.fixture
+def athlete_without_races(database):
+    with model.Scoped_Session() as session:
+        athlete = model.Athlete(name="TEST, Athlete", first_name__="Athlete", last_name__="TEST")
+        session.add(athlete)
+        session.commit()
+        return athlete.id
+
+
+def get_athlete(client, auth_headers, athlete_id):
+    return client.get(f"/get_athlete/{athlete_id}", headers=auth_headers)
+
+
+def test_query_count_independent_of_number_of_races(client, auth_headers, world_cups, sql_instrumentation):
+    with model.Scoped_Session() as session:
+        statement = (
+            select(model.Association_Race_Boat_Athlete.athlete_id, func.count().label("races"))
+            .group_by(model.Association_Race_Boat_Athlete.athlete_id)
+            .order_by(func.count().desc())
+            .limit(1)
+        )
+        athlete_id, races = session.execute(statement).one()
+    assert races >= 200
+
+    # the athlete and the projection query of the races (raises Query_Budget_Exceeded otherwise)
+    sql_instrumentation["SQL_QUERY_BUDGET"] = {"get_athlete": 2}
+    response = get_athlete(client, auth_headers, athlete_id)
+    assert response.status_code == 200
+    athlete = json.loads(response.data)
+    assert athlete["num_of_races"] == races
+    assert len(athlete["race_list"]) == races
+    assert athlete["gender"] != None
+
+
+def test_unknown_athlete(client, auth_headers, database):
+    response = get_athlete(client, auth_headers, 2**31 - 1)
+    assert response.status_code == 404
+
+
+def test_athlete_without_races(client, auth_headers, athlete_without_races):
+    response = get_athlete(client, auth_headers, athlete_without_races)
+    assert response.status_code == 200
+    athlete = json.loads(response.data)
+    assert athlete["gender"] == None
+    assert athlete["nation"] == ""
+    assert athlete["num_of_races"] == 0
+    assert athlete["race_list"] == []
+    assert athlete["medals_total"] == 0 and athlete["final_a"] == 0
@@ -0,0 +1,26 @@
+import copy
+
+from sqlalchemy import select
+
+from model import model, dbutils
+
+
+def test_race_boat_listed_twice_keeps_last_intermediates(example_competition):
+    competition_data = copy.deepcopy(example_competition)
+    race = competition_data["events"][0]["races"][0]
+    race_boat = copy.deepcopy(race["raceBoats"][0])
+    for interm_data in race_boat["raceBoatIntermediates"]:
+        interm_data["Rank"] = 6
+    race["raceBoats"].append(race_boat)
+
+    with model.Scoped_Session() as session:
+        dbutils.wr_bulk_upsert_competition(session, competition_data)
+        session.commit()
+
+        statement = (
+            select(model.Intermediate_Time.rank)
+            .join(model.Race_Boat)
+            .where(model.Race_Boat.additional_id_ == race_boat["id"].lower())
+        )
+        ranks = session.execute(statement).scalars().all()
+    assert ranks and set(ranks) == {6}
@@ -0,0 +1,96 @@
+import random
+import statistics
+
+import numpy as np
+import pytest
+
+from api import descriptive_stats
+
+
+# former implementation of /get_report_boat_class and /competition_matrix (statistics module and plain lists)
+
+def former_summary(values: list):
+    return (len(values), min(values), max(values), int(statistics.mean(values)),
+            int(statistics.stdev(values)) if len(values) > 1 else 0, int(statistics.median(values)))
+
+
+def former_histogram(values: list):
+    hist_data, bin_edges = np.histogram(values, bins="fd")
+    hist_mean = np.average(bin_edges[:-1], weights=hist_data)
+    hist_std = np.sqrt(np.average((bin_edges[:-1] - hist_mean) ** 2, weights=hist_data))
+    return hist_data.tolist(), [int(bin_edge) for bin_edge in bin_edges], hist_mean, hist_mean - hist_std, hist_mean + hist_std
+
+
+def former_gradations(values: list, mean_time, stdev_race_time):
+    buckets = [
+        [x for x in values if x < (mean_time - stdev_race_time)],
+        [x for x in values if (mean_time - stdev_race_time) < x < (mean_time - (1 / 3 * stdev_race_time))],
+        [x for x in values if (mean_time - (1 / 3 * stdev_race_time)) < x < (mean_time + (1 / 3 * stdev_race_time))],
+        [x for x in values if x > (mean_time + (1 / 3 * stdev_race_time))],
+    ]
+    return [(len(bucket), int(statistics.mean(bucket)) if bucket else 0) for bucket in buckets]
+
+
+def assert_like_former(values: list):
+    array = descriptive_stats.as_array(values)
+    assert descriptive_stats.mean(array) == statistics.mean(values)
+    assert type(descriptive_stats.mean(array)) == type(statistics.mean(values))
+    assert descriptive_stats.int_mean(array) == int(statistics.mean(values))
+    if len(values) > 1:
+        # the reports truncate (/get_report_boat_class) or round (/competition_matrix) the standard deviation
+        stdev, stdev_former = descriptive_stats.stdev(array), statistics.stdev(values)
+        assert stdev == pytest.approx(stdev_former, rel=1e-12)
+        assert int(stdev) == int(stdev_former)
+        assert round(stdev, 1) == round(stdev_former, 1)
+
+    summary = descriptive_stats.describe(array)
+    assert tuple(summary) == former_summary(values)
+    assert tuple(descriptive_stats.histogram_fd(array)) == former_histogram(values)
+    assert descriptive_stats.gradations(array, summary.mean, summary.stdev) == \
+        former_gradations(values, summary.mean, summary.stdev)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_random_result_times(seed):
+    rng = random.Random(seed)
+    assert_like_former([rng.randint(380_000, 480_000) for _ in range(rng.randint(2, 500))])
+
+
+def test_single_value():
+    assert_like_former([412_345])
+    assert descriptive_stats.stdev(descriptive_stats.as_array([412_345])) == 0
+
+
+def test_empty():
+    empty = descriptive_stats.as_array([])
+    with pytest.raises(statistics.StatisticsError):
+        descriptive_stats.mean(empty)
+    assert descriptive_stats.int_mean(empty) == 0
+    assert descriptive_stats.stdev(empty) == 0
+    assert descriptive_stats.gradations(empty, 0, 0) == [(0, 0)] * len(descriptive_stats.GRADATIONS)
+    with pytest.raises(ValueError):
+        descriptive_stats.describe(empty)
+
+
+def test_none_is_rejected():
+    # callers filter missing result times first
+    with pytest.raises(TypeError):
+        descriptive_stats.as_array([412_345, None])
+
+
+def test_large_values():
+    # squares and sums exceed 2**53 (float) and the squares sum 2**63 (int64)
+    int32_max = np.iinfo(np.int32).max
+    assert_like_former([int32_max, int32_max - 1, int32_max - 2, int32_max - 7, 5, 1_000_003])
+    assert_like_former([int32_max] * 3 + [int32_max - 1])
+
+    with pytest.raises(OverflowError):
+        descriptive_stats.as_array([int32_max + 1])
+
+
+def test_values_on_gradation_bounds_belong_to_no_bucket():
+    # bounds: 70, 90, 110
+    values = [69, 70, 71, 89, 90, 91, 109, 110, 111]
+    gradations = descriptive_stats.gradations(descriptive_stats.as_array(values), 100, 30)
+    assert gradations == former_gradations(values, 100, 30)
+    assert gradations == [(1, 69), (2, 80), (2, 100), (1, 111)]
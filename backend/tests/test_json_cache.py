@@ -0,0 +1,31 @@
+import importlib
+
+import pytest
+
+from scraping_wr import json_cache
+
+
+@pytest.fixture
+def load_config(monkeypatch):
+    """Reloads json_cache with the given environment"""
+    def load(**environ):
+        for name in ("SCRAPER_JSON_CACHE_MODE", "SCRAPER_JSON_CACHE_TTL_SECONDS"):
+            monkeypatch.delenv(name, raising=False)
+        for name, value in environ.items():
+            monkeypatch.setenv(name, value)
+        return importlib.reload(json_cache)
+    yield load
+    monkeypatch.undo()
+    importlib.reload(json_cache)
+
+
+def test_ttl_defaults(load_config):
+    assert load_config().JSON_CACHE_TTL_SECONDS == 0
+    assert load_config(SCRAPER_JSON_CACHE_MODE="ttl").JSON_CACHE_TTL_SECONDS == 24 * 60 * 60
+    assert load_config(SCRAPER_JSON_CACHE_MODE="ttl", SCRAPER_JSON_CACHE_TTL_SECONDS="60").JSON_CACHE_TTL_SECONDS == 60
+
+
+@pytest.mark.parametrize("ttl", ["0", "-1"])
+def test_ttl_mode_requires_positive_ttl(load_config, ttl):
+    with pytest.raises(ValueError, match="requires SCRAPER_JSON_CACHE_TTL_SECONDS > 0"):
+        load_config(SCRAPER_JSON_CACHE_MODE="ttl", SCRAPER_JSON_CACHE_TTL_SECONDS=ttl)
@@ -0,0 +1,59 @@
+import types
+
+import pytest
+
+from scraping_wr import pdf_cache, http_client
+
+
+URL = "https://example.org/results.pdf"
+
+
+class Fake_Server:
+    """Serves one PDF with an ETag and answers matching If-None-Match with 304"""
+    def __init__(self, content=b"%PDF provisional"):
+        self.content = content
+        self.requests = []
+
+    @property
+    def etag(self):
+        return f'"{pdf_cache.content_hash(self.content)[:8]}"'
+
+    def get(self, url, headers=None, **kwargs):
+        self.requests.append(dict(headers or {}))
+        if (headers or {}).get("If-None-Match") == self.etag:
+            return types.SimpleNamespace(status_code=304, content=b"", headers={})
+        return types.SimpleNamespace(status_code=200, content=self.content, headers={"ETag": self.etag})
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    server = Fake_Server()
+    monkeypatch.setattr(pdf_cache, "PDF_CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(pdf_cache, "stats", {"hits": 0, "not_modified": 0, "misses": 0})
+    monkeypatch.setattr(http_client, "get", server.get)
+    return server
+
+
+def test_recent_entry_is_revalidated(server):
+    assert pdf_cache.fetch(URL) == (200, b"%PDF provisional")
+    assert pdf_cache.fetch(URL) == (200, b"%PDF provisional")
+    assert server.requests[1] == {"If-None-Match": server.etag}
+
+    server.content = b"%PDF official"
+    assert pdf_cache.fetch(URL) == (200, b"%PDF official")
+    assert pdf_cache.get(URL) == b"%PDF official"
+    assert pdf_cache.stats_snapshot() == {"hits": 0, "not_modified": 1, "misses": 2}
+
+
+def test_entry_unchanged_for_revalidation_period_is_final(server, monkeypatch):
+    monkeypatch.setattr(pdf_cache, "PDF_CACHE_REVALIDATE_SECONDS", 0)
+    pdf_cache.fetch(URL)
+    server.content = b"%PDF official"
+
+    assert pdf_cache.fetch(URL) == (200, b"%PDF provisional")
+    assert len(server.requests) == 1
+    assert pdf_cache.stats_snapshot()["hits"] == 1
+
+    pdf_cache.invalidate(URL)
+    assert pdf_cache.fetch(URL) == (200, b"%PDF official")
+    assert server.requests[-1] == {}
@@ -0,0 +1,156 @@
+import json
+
+import pytest
+from sqlalchemy import select, delete
+
+from model import model
+from api import race as r
+from common.rowing import propulsion_in_meters_per_stroke
+from tests.conftest import WORLD_CUP_FIRST_YEAR, sql_queries
+
+
+def race_boat_groups_request(start_year, end_year, **options):
+    return {"data": {
+        "boat_class": "M1x",
+        "groups": [{
+            "start_year": start_year,
+            "end_year": end_year,
+            "country": "S01",
+            "events": ["WCp 1", "WCp 2", "WCp 3", "WCH"],
+            "placements": [1, 2, 3, 4, 5, 6],
+            "phases": ["heat", "final A", "final B"]
+        }],
+        **options
+    }}
+
+
+def test_query_count_independent_of_number_of_boats(client, auth_headers, world_cups, sql_instrumentation):
+    def post(data):
+        return client.post("/get_race_boat_groups", headers=auth_headers, json=data)
+
+    # fills the per-process world best time cache (model.world_best_times)
+    post(race_boat_groups_request(WORLD_CUP_FIRST_YEAR, WORLD_CUP_FIRST_YEAR))
+
+    response = post(race_boat_groups_request(WORLD_CUP_FIRST_YEAR, WORLD_CUP_FIRST_YEAR))
+    assert response.status_code == 200
+    # ten times the boats within the query budget of one year (raises Query_Budget_Exceeded otherwise)
+    sql_instrumentation["SQL_QUERY_BUDGET"] = {"get_race_boat_groups": sql_queries(response)}
+    response_10x = post(race_boat_groups_request(WORLD_CUP_FIRST_YEAR, WORLD_CUP_FIRST_YEAR + 9))
+    assert response_10x.status_code == 200
+
+    group, group_10x = json.loads(response.data)["groups"][0], json.loads(response_10x.data)["groups"][0]
+    assert group["count"] > 0
+    assert group_10x["count"] == 10 * group["count"]
+    assert len(group_10x["race_boats"]) == group_10x["count"]
+    assert sql_queries(response_10x) == sql_queries(response)
+
+
+@pytest.mark.parametrize("options", [
+    {"include_race_boats": "false"},
+    {"include_race_boats": 0},
+    {"race_boats_limit": True},
+    {"race_boats_limit": 0},
+    {"race_boats_limit": "10"},
+    {"race_data_resolution": True},
+    {"race_data_resolution": 2.5},
+])
+def test_invalid_options(client, auth_headers, options):
+    data = race_boat_groups_request(WORLD_CUP_FIRST_YEAR, WORLD_CUP_FIRST_YEAR, **options)
+    assert client.post("/get_race_boat_groups", headers=auth_headers, json=data).status_code == 400
+
+
+@pytest.mark.parametrize("cursor", [[1], {"id": 1}, True, 1.5, "next"])
+def test_invalid_cursor(client, auth_headers, cursor):
+    data = race_boat_groups_request(WORLD_CUP_FIRST_YEAR, WORLD_CUP_FIRST_YEAR)
+    data["data"]["groups"][0]["race_boats_cursor"] = cursor
+    assert client.post("/get_race_boat_groups", headers=auth_headers, json=data).status_code == 400
+
+
+def test_pages(client, auth_headers, world_cups):
+    data = race_boat_groups_request(WORLD_CUP_FIRST_YEAR, WORLD_CUP_FIRST_YEAR, race_boats_limit=5)
+    group = json.loads(client.post("/get_race_boat_groups", headers=auth_headers, json=data).data)["groups"][0]
+    assert len(group["race_boats"]) == 5
+    cursor = group["race_boats_next_cursor"]
+
+    pages = []
+    for cursor_ in (cursor, int(cursor)):
+        data["data"]["groups"][0]["race_boats_cursor"] = cursor_
+        response = client.post("/get_race_boat_groups", headers=auth_headers, json=data)
+        assert response.status_code == 200
+        pages.append(json.loads(response.data)["groups"][0]["race_boats"])
+    assert pages[0] == pages[1]
+    assert pages[0] and pages[0] != group["race_boats"]
+
+
+def former_group_summary(race_boats: list, race_data_resolution=None) -> tuple:
+    """The summaries (stats, stats_race_data) as computed before race.raceBoatGroupSummary(): figures per boat like
+    in the "race_boats" payload, then calculateConfidenceIntervall() per distance and metric"""
+    stats, stats_gps = {}, {}
+    for boat in race_boats:
+        intermediates = r.calculateIntermediateTimes(r.getIntermediateTimes(boat))
+        for distance, stroke in r.strokes_for_intermediate_steps(boat.race_data).items():
+            if intermediates.get(distance) is not None:
+                intermediates[distance]["stroke [1/min]"] = stroke
+        for distance, values in intermediates.items():
+            for key, figure in values.items():
+                stats.setdefault(distance, {}).setdefault(key, []).append(figure)
+
+        for race_data in sorted(boat.race_data, key=lambda x: x.distance_meter):
+            if race_data_resolution and race_data.distance_meter % race_data_resolution != 0:
+                continue
+            values = stats_gps.setdefault(str(race_data.distance_meter), {})
+            values.setdefault("speed [m/s]", []).append(race_data.speed_meter_per_sec)
+            values.setdefault("stroke [1/min]", []).append(race_data.stroke)
+            values.setdefault("propulsion [m/stroke]", []).append(
+                propulsion_in_meters_per_stroke(race_data.stroke, race_data.speed_meter_per_sec)
+            )
+
+    def summarize(stats: dict) -> dict:
+        summary = {}
+        for distance, values in stats.items():
+            summary[distance] = {}
+            for key, figures in values.items():
+                if key != "is_outlier":
+                    mean, lower, upper = r.calculateConfidenceIntervall(figures)
+                    summary[distance][key] = {"mean": mean, "lower_bound": lower, "upper_bound": upper}
+        return summary
+
+    return summarize(stats), summarize(stats_gps)
+
+
+@pytest.mark.parametrize("race_data_resolution", [None, 400])
+def test_group_summary_like_per_boat_figures(world_cups, race_data_resolution):
+    with model.Scoped_Session() as session:
+        race_boat_ids = session.execute(
+            select(model.Race_Boat.id)
+            .join(model.Race_Boat.race).join(model.Race.event).join(model.Event.boat_class)
+            .join(model.Event.competition)
+            .where(model.Boat_Class.abbreviation == "M1x", model.Competition.year <= WORLD_CUP_FIRST_YEAR + 1)
+            .order_by(model.Race_Boat.id)
+        ).scalars().all()
+        # a boat without race data (rolled back below)
+        session.execute(delete(model.Race_Data).where(model.Race_Data.race_boat_id == race_boat_ids[1]))
+        session.expire_all()
+        race_boats = [session.get(model.Race_Boat, race_boat_id) for race_boat_id in race_boat_ids]
+        assert race_boats[1].race_data == [] and race_boats[0].race_data != []
+
+        # the whole group, and single boats (no confidence interval) with and without race data
+        summaries = []
+        for group in (race_boats, race_boats[:1], race_boats[1:2]):
+            stats, stats_race_data = r.raceBoatGroupSummary(session, [boat.id for boat in group], race_data_resolution)
+            stats_former, stats_race_data_former = former_group_summary(group, race_data_resolution)
+            assert stats == stats_former
+            assert stats_race_data == stats_race_data_former
+            assert list(stats_race_data) == list(stats_race_data_former)
+            summaries.append((stats, stats_race_data))
+        session.rollback()
+
+    (stats, stats_race_data), (single_stats, single_stats_race_data), (_, no_race_data) = summaries
+    speed, single_speed = stats[1000]["speed [m/s]"], single_stats[1000]["speed [m/s]"]
+    assert speed["lower_bound"] < speed["mean"] < speed["upper_bound"]
+    assert single_speed["lower_bound"] == single_speed["mean"] == single_speed["upper_bound"]
+    assert "stroke [1/min]" in stats[1000] and no_race_data == {}
+    if race_data_resolution:
+        assert list(single_stats_race_data) == ["400", "800", "1200", "1600", "2000"]
+    else:
+        assert len(single_stats_race_data) == 10
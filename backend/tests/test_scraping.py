@@ -0,0 +1,47 @@
+import copy
+import datetime
+
+import pytest
+
+from model import model, dbutils
+from scraper_procedures import scraping
+
+
+@pytest.fixture
+def competition_id(example_competition, monkeypatch):
+    """Prescraped example competition; the World Rowing API always returns the same payload for it"""
+    monkeypatch.setattr(scraping.api, "get_by_competition_id_",
+                        lambda comp_ids, parse_pdf: copy.deepcopy(example_competition))
+
+    with model.Scoped_Session() as session:
+        competition = dbutils.wr_insert(session, model.Competition, dbutils.wr_map_competition_prescrape,
+                                        example_competition, overwrite_existing=False)
+        session.commit()
+        return competition.id
+
+
+def _move_into_rescrape_window(competition_id):
+    with model.Scoped_Session() as session:
+        session.get(model.Competition, competition_id).end_date = datetime.datetime.now()
+        session.commit()
+
+
+def _timestamps(competition_id):
+    """Returns tuple (scraper_last_scrape, digest timestamp)"""
+    with model.Scoped_Session() as session:
+        competition = session.get(model.Competition, competition_id)
+        digest = session.get(model.Scraper_Competition_Digest, competition_id)
+        return competition.scraper_last_scrape, digest.timestamp
+
+
+def test_unchanged_competition_keeps_last_scrape(competition_id):
+    _move_into_rescrape_window(competition_id)
+    assert scraping._scrape_competition_by_id(competition_id, parse_pdf=False)["scraped"]
+    last_scrape, checked = _timestamps(competition_id)
+
+    _move_into_rescrape_window(competition_id)
+    assert scraping._scrape_competition_by_id(competition_id, parse_pdf=False) == {"scraped": False, "pdfs": 0}
+    last_scrape_, checked_ = _timestamps(competition_id)
+
+    assert last_scrape_ == last_scrape
+    assert checked_ > checked
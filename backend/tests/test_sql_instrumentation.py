@@ -0,0 +1,58 @@
+import re
+import logging
+
+import pytest
+
+from api.sql_instrumentation import Query_Budget_Exceeded
+from tests.conftest import sql_queries
+
+
+# /get_athlete of an unknown athlete sends one statement (session.get)
+UNKNOWN_ATHLETE = "/get_athlete/2147483647"
+
+
+def test_server_timing_header(client, auth_headers, database, sql_instrumentation):
+    response = client.get(UNKNOWN_ATHLETE, headers=auth_headers)
+    assert response.status_code == 404
+
+    server_timing = response.headers["Server-Timing"]
+    db_ms = float(re.search(r'db;dur=([0-9.]+);', server_timing).group(1))
+    assert sql_queries(response) == 1
+    assert db_ms > 0
+    assert 'sql-1;dur=' in server_timing and 'SELECT' in server_timing
+
+
+def test_no_header_unless_enabled(client, auth_headers, database):
+    assert "Server-Timing" not in client.get(UNKNOWN_ATHLETE, headers=auth_headers).headers
+
+
+@pytest.mark.parametrize("budget", [{"get_athlete": 0}, {None: 0}, 0])
+def test_budget_exceeded_in_testing(client, auth_headers, database, sql_instrumentation, budget):
+    sql_instrumentation["SQL_QUERY_BUDGET"] = budget
+    with pytest.raises(Query_Budget_Exceeded, match='"get_athlete" sent 1 SQL statements, budget is 0'):
+        client.get(UNKNOWN_ATHLETE, headers=auth_headers)
+
+
+def test_budget_exceeded_strict(client, auth_headers, database, sql_instrumentation, monkeypatch):
+    monkeypatch.setitem(sql_instrumentation, "TESTING", False)
+    monkeypatch.setitem(sql_instrumentation, "PROPAGATE_EXCEPTIONS", True)
+    sql_instrumentation["SQL_QUERY_BUDGET"] = {"get_athlete": 0}
+    sql_instrumentation["SQL_QUERY_BUDGET_STRICT"] = True
+    with pytest.raises(Query_Budget_Exceeded):
+        client.get(UNKNOWN_ATHLETE, headers=auth_headers)
+
+
+def test_budget_exceeded_warns_unless_strict(client, auth_headers, database, sql_instrumentation, monkeypatch,
+                                             caplog):
+    monkeypatch.setitem(sql_instrumentation, "TESTING", False)
+    sql_instrumentation["SQL_QUERY_BUDGET"] = {"get_athlete": 0}
+    with caplog.at_level(logging.WARNING, logger="api.sql_instrumentation"):
+        assert client.get(UNKNOWN_ATHLETE, headers=auth_headers).status_code == 404
+    assert "budget is 0" in caplog.text
+
+
+@pytest.mark.parametrize("budget", [{"get_athlete": 1}, {"get_race": 0, None: 1}, 1])
+def test_within_budget(client, auth_headers, database, sql_instrumentation, budget):
+    sql_instrumentation["SQL_QUERY_BUDGET"] = budget
+    sql_instrumentation["SQL_QUERY_BUDGET_STRICT"] = True
+    assert client.get(UNKNOWN_ATHLETE, headers=auth_headers).status_code == 404